@@ -2,10 +2,24 @@
 import click
 from flask.cli import with_appcontext
 from app import db
-from app.models import User
+from datetime import datetime
+
+from app.models import User, Wholesaler, Product, StandingOrderItem, OrderSchedule
+from app.utils.order_utils import generate_daily_lists
+from app.utils.scheduler import DayRule, run_scheduler, store_now
+from app.utils.sales_rollup import rebuild_sales_rollup
+from app.utils.order_views import refresh_order_views
+from app.utils.column_store import STORE_TABLES, update_table
 
 def register_commands(app):
     app.cli.add_command(create_owner)
+    app.cli.add_command(generate_daily_lists_command)
+    app.cli.add_command(set_standing_order)
+    app.cli.add_command(set_order_schedule)
+    app.cli.add_command(run_scheduler_command)
+    app.cli.add_command(rebuild_sales_rollup_command)
+    app.cli.add_command(refresh_order_analytics)
+    app.cli.add_command(update_column_store)
 
 @click.command('create-owner')
 @click.argument('username')
@@ -27,4 +41,130 @@ def create_owner(username, email, password):
     except Exception as e:
         click.echo(f'Error creating owner user: {str(e)}')
         db.session.rollback()
-        
\ No newline at end of file
+
+@click.command('generate-daily-lists')
+@click.option('--prefill', is_flag=True, help="Copy each wholesaler's standing order onto its new list")
+@with_appcontext
+def generate_daily_lists_command(prefill):
+    """Open today's pending daily order lists; run from cron before opening"""
+    try:
+        result = generate_daily_lists(prefill=prefill)
+        db.session.commit()
+        click.echo(f"Created {result['created']} daily order lists "
+                   f"with {result['prefilled_items']} standing order items")
+    except Exception as e:
+        click.echo(f'Error generating daily order lists: {str(e)}')
+        db.session.rollback()
+
+@click.command('set-standing-order')
+@click.argument('wholesaler_id', type=int)
+@click.argument('product_code')
+@click.argument('quantity', type=int)
+@with_appcontext
+def set_standing_order(wholesaler_id, product_code, quantity):
+    """Set a wholesaler's standing quantity of a product; 0 removes it"""
+    try:
+        if not db.session.get(Wholesaler, wholesaler_id):
+            click.echo(f'Wholesaler {wholesaler_id} not found')
+            return
+        product = Product.query.filter_by(product_id=product_code, wholesaler_id=wholesaler_id).first()
+        if not product:
+            click.echo(f'Product {product_code} not found for wholesaler {wholesaler_id}')
+            return
+        item = StandingOrderItem.query.filter_by(wholesaler_id=wholesaler_id, product_id=product.id).first()
+        if quantity <= 0:
+            if item:
+                db.session.delete(item)
+        elif item:
+            item.quantity = quantity
+        else:
+            db.session.add(StandingOrderItem(wholesaler_id=wholesaler_id, product_id=product.id,
+                                             quantity=quantity))
+        db.session.commit()
+        click.echo(f'Standing order for {product.name} set to {max(quantity, 0)}')
+    except Exception as e:
+        click.echo(f'Error setting standing order: {str(e)}')
+        db.session.rollback()
+
+@click.command('set-order-schedule')
+@click.argument('wholesaler_id', type=int)
+@click.argument('list_type', type=click.Choice(['daily', 'monthly']))
+@click.argument('days')
+@click.argument('cutoff')
+@click.option('--every-weeks', default=1, type=int, help='Only every n-th matching week, counted from today')
+@click.option('--prefill', is_flag=True, help="Copy the standing order onto each new list")
+@click.option('--inactive', is_flag=True, help='Disable the schedule')
+@with_appcontext
+def set_order_schedule(wholesaler_id, list_type, days, cutoff, every_weeks, prefill, inactive):
+    """Set when a wholesaler's lists are finalized, e.g. "* * mon,thu" 14:00"""
+    try:
+        DayRule(days, every_weeks)
+        cutoff_time = datetime.strptime(cutoff, '%H:%M').time()
+    except ValueError as e:
+        click.echo(f'Invalid schedule: {str(e)}')
+        return
+    try:
+        if not db.session.get(Wholesaler, wholesaler_id):
+            click.echo(f'Wholesaler {wholesaler_id} not found')
+            return
+        schedule = OrderSchedule.query.filter_by(wholesaler_id=wholesaler_id, list_type=list_type).first()
+        if not schedule:
+            schedule = OrderSchedule(wholesaler_id=wholesaler_id, list_type=list_type)
+            db.session.add(schedule)
+        schedule.days = days
+        schedule.cutoff_time = cutoff_time
+        schedule.every_weeks = every_weeks
+        schedule.anchor_date = store_now().date()
+        schedule.prefill = prefill
+        schedule.active = not inactive
+        schedule.next_due_at = None  # recomputed by the scheduler on its next load
+        db.session.commit()
+        click.echo(f'Schedule for wholesaler {wholesaler_id} ({list_type}) saved')
+    except Exception as e:
+        click.echo(f'Error saving schedule: {str(e)}')
+        db.session.rollback()
+
+@click.command('run-scheduler')
+@click.option('--once', is_flag=True, help='Handle due schedules once and exit (for cron)')
+@with_appcontext
+def run_scheduler_command(once):
+    """Finalize and open order lists when their schedules are due"""
+    result = run_scheduler(once=once)
+    if once:
+        click.echo(f"Finalized {result['finalized']} and opened {result['opened']} order lists")
+
+@click.command('rebuild-sales-rollup')
+@with_appcontext
+def rebuild_sales_rollup_command():
+    """Recompute sales_daily_rollup from daily_sales"""
+    try:
+        rows = rebuild_sales_rollup()
+        db.session.commit()
+        click.echo(f'Rebuilt {rows} sales rollup rows')
+    except Exception as e:
+        click.echo(f'Error rebuilding sales rollup: {str(e)}')
+        db.session.rollback()
+
+@click.command('refresh-order-analytics')
+@with_appcontext
+def refresh_order_analytics():
+    """Refresh the order analytics views; run from cron"""
+    try:
+        refresh_order_views()
+        db.session.commit()
+        click.echo('Order analytics views refreshed')
+    except Exception as e:
+        click.echo(f'Error refreshing order analytics views: {str(e)}')
+        db.session.rollback()
+
+@click.command('update-column-store')
+@with_appcontext
+def update_column_store():
+    """Append closed days to the analytics column store, rebuilding edited tables"""
+    try:
+        for table in STORE_TABLES:
+            manifest = update_table(table, blocking=True)
+            click.echo(f"{table.name}: {manifest['rows']} rows through {manifest['watermark']}")
+    except Exception as e:
+        click.echo(f'Error updating column store: {str(e)}')
+        db.session.rollback()
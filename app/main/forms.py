@@ -33,9 +33,15 @@ class OrderListForm(FlaskForm):
 
 class BulkUploadForm(FlaskForm):
     file = FileField('Excel File', validators=[
-        FileAllowed(['xlsx'], 'Please upload only Excel files (.xlsx)'),
+        FileAllowed(['xlsx', 'zip'], 'Please upload an Excel file (.xlsx) or a ZIP of Excel files'),
         DataRequired()
     ])
+    mode = SelectField('Import Mode',
+                      choices=[('standard', 'Standard'),
+                               ('stream', 'Streaming (very large files)'),
+                               ('multi', 'All sheets / ZIP of workbooks (parallel)'),
+                               ('diff', 'Wholesaler price sheet (apply changes only)')],
+                      default='standard')
     submit = SubmitField('Upload Products')
 
 class CustomerOrderForm(FlaskForm):
@@ -4,13 +4,13 @@ from datetime import datetime, timedelta
 
 import pandas as pd
 
-from flask import render_template, flash, redirect, url_for, request, jsonify, current_app
+from flask import render_template, flash, redirect, url_for, request, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_, desc, func
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy import or_, and_, case, desc, func, select, update, delete
 from sqlalchemy.orm import joinedload
 
 from werkzeug.utils import secure_filename
@@ -26,9 +26,24 @@ from app.main.forms import (ProductForm, WholesalerForm, OrderListForm,
 from app.forms import DailySalesForm
 
 from app.models import (User, Product, Wholesaler, OrderList, OrderListItem,
-                        CustomerOrder, CustomerOrderItem, DailySales, SalesDocument)
+                        CustomerOrder, CustomerOrderItem, DailySales, SalesDocument,
+                        ProductPriceHistory, DISCREPANCY_THRESHOLD)
 
 from app.utils.storage import CloudinaryStorage
+from app.utils.search import search_catalog, best_product_match, MAX_LIMIT as MAX_SEARCH_LIMIT
+from app.utils.catalog_index import get_catalog_index, invalidate_catalog_index
+from app.utils.product_utils import delete_products_by_id, delete_wholesaler_by_id
+from app.utils.order_lists import (process_scans, apply_order_list_operations, add_to_pending_lists,
+                                   forget_pending_lists, finalize_pending_lists,
+                                   pending_items_by_wholesaler, pending_order_lists)
+from app.utils.pagination import keyset_paginate, capped_count
+from app.utils.order_views import order_weekday_totals, top_ordered_products, pending_list_count
+from app.utils.sales_rollup import (
+    add_sales_to_rollup, remove_sales_from_rollup, sales_summary, daily_sales_totals
+)
+from app.utils.product_import import (import_products_from_excel, stream_import_products,
+                                      parallel_import_products, diff_import_products,
+                                      STREAM_CHUNK_SIZE)
 from flask import render_template
 from flask_login import login_required, current_user
 from app.main import bp
@@ -54,7 +69,9 @@ from app.utils.analytics import (
     analyze_top_products,
     analyze_wholesaler_performance,
     get_sales_trend_data,
-    get_order_trend_data
+    get_order_trend_data,
+    get_trend_data,
+    TREND_SERIES
 )
 # In app/main/routes.py
 
@@ -69,8 +86,7 @@ def index():
     if current_user.role == 'owner':
         try:
             # Today's sales total
-            today_sales = DailySales.query.filter_by(date=today).all()
-            total_sales = sum(sale.total_actual for sale in today_sales) if today_sales else 0
+            total_sales = sales_summary(today, today).total_sales
             
             # Fetch pending orders counts
             daily_orders = OrderList.query.filter_by(type='daily', status='pending').count()
@@ -84,7 +100,7 @@ def index():
             recent_discrepancies = DailySales.query\
                 .filter(
                     DailySales.date == today,  # Only today's discrepancies
-                    DailySales.overall_discrepancy.notin_([-10, 10])
+                    func.abs(DailySales.overall_discrepancy) > DISCREPANCY_THRESHOLD
                 )\
                 .order_by(desc(DailySales.report_time))\
                 .limit(5)\
@@ -163,52 +179,79 @@ def monthly_orders():
 @bp.route('/add_to_order_list', methods=['POST'])
 @login_required
 def add_to_order_list():
-    data = request.json
+    data = request.json or {}
     try:
-        product = Product.query.get(data['product_id'])
-        if not product:
+        # Re-adding a product already on the list increases its quantity
+        result = apply_order_list_operations([{
+            'op': 'add',
+            'product_id': data.get('product_id'),
+            'quantity': data.get('quantity'),
+            'order_type': data.get('order_type')
+        }])
+        if result['missing_products']:
+            db.session.rollback()
             return jsonify({'success': False, 'message': 'Product not found'}), 404
-        
-        order_list = OrderList.query.filter_by(
-            wholesaler_id=product.wholesaler_id,
-            status='pending',
-            type=data['order_type']
-        ).first()
-        
-        if not order_list:
-            order_list = OrderList(wholesaler_id=product.wholesaler_id, type=data['order_type'])
-            db.session.add(order_list)
-        
-        order_item = OrderListItem(
-            order_list=order_list,
-            product_id=product.id,
-            quantity=data['quantity']
-        )
-        db.session.add(order_item)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Item added to order list'})
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error in add_to_order_list: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while adding the item to the order list'}), 500
 
+@bp.route('/order_list_items/batch', methods=['POST'])
+@login_required
+def batch_order_list_items():
+    """Apply a list of add/update/remove operations to pending order lists in one transaction"""
+    data = request.json or {}
+    try:
+        result = apply_order_list_operations(data.get('operations'))
+        if result['missing_items'] or result['missing_products']:
+            db.session.rollback()
+            # Nothing was applied, so only report what was missing
+            return jsonify({'success': False,
+                            'message': 'Some items or products were not found; nothing was changed',
+                            'missing_items': result['missing_items'],
+                            'missing_products': result['missing_products']}), 404
+        db.session.commit()
+        return jsonify(dict(result, success=True))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in batch_order_list_items: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while updating the order lists'}), 500
+
+@bp.route('/scan_products', methods=['POST'])
+@login_required
+def scan_products():
+    """Resolve a batch of scanned product codes, optionally adding them to pending order lists"""
+    data = request.json or {}
+    codes = data.get('codes')
+    if not isinstance(codes, list):
+        return jsonify({'success': False, 'message': 'codes must be a list of product codes'}), 400
+    try:
+        result = process_scans(codes, add=bool(data.get('add')))
+        if result['added']:
+            db.session.commit()
+        return jsonify(dict(result, success=True))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in scan_products: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while processing the scanned codes'}), 500
+
 @bp.route('/get_daily_orders')
 @login_required
 def get_daily_orders():
     try:
-        daily_orders = OrderList.query.filter_by(type='daily', status='pending').all()
-        orders_dict = {}
-        for order in daily_orders:
-            if order.wholesaler.name not in orders_dict:
-                orders_dict[order.wholesaler.name] = []
-            for item in order.items:
-                orders_dict[order.wholesaler.name].append({
-                    'id': item.id,
-                    'product_name': item.product.name,
-                    'quantity': item.quantity
-                })
-        return jsonify(orders_dict)
+        return jsonify(pending_items_by_wholesaler('daily'))
     except Exception as e:
         current_app.logger.error(f"Error in get_daily_orders: {str(e)}")
         return jsonify({'error': 'An error occurred while fetching daily orders'}), 500
@@ -251,18 +294,7 @@ def remove_order_item(item_id):
 @login_required
 def get_monthly_orders():
     try:
-        monthly_orders = OrderList.query.filter_by(type='monthly', status='pending').all()
-        orders_dict = {}
-        for order in monthly_orders:
-            if order.wholesaler.name not in orders_dict:
-                orders_dict[order.wholesaler.name] = []
-            for item in order.items:
-                orders_dict[order.wholesaler.name].append({
-                    'id': item.id,
-                    'product_name': item.product.name,
-                    'quantity': item.quantity
-                })
-        return jsonify(orders_dict)
+        return jsonify(pending_items_by_wholesaler('monthly'))
     except Exception as e:
         current_app.logger.error(f"Error in get_monthly_orders: {str(e)}")
         return jsonify({'error': 'An error occurred while fetching monthly orders'}), 500
@@ -280,26 +312,81 @@ def products():
         file.save(file_path)
         
         try:
-            products = process_excel_file(file_path)
-            for product_data in products:
-                product = Product(**product_data)
-                db.session.add(product)
-            db.session.commit()
-            flash(f'{len(products)} products added successfully!', 'success')
+            run_bulk_import(file_path, bulk_form.mode.data)
         except Exception as e:
+            db.session.rollback()
             flash(f'Error processing file: {str(e)}', 'error')
         finally:
             os.remove(file_path)  # Remove the uploaded file after processing
         
         return redirect(url_for('main.products'))
 
+    filters = product_filters_from_args(request.args)
+    wholesalers = db.session.query(Wholesaler.id, Wholesaler.name).order_by(Wholesaler.name).all()
     try:
-        products = Product.query.all()
-        return render_template('products.html', title='Products', products=products, bulk_form=bulk_form)
+        page = product_page(filters)
+        return render_template('products.html', title='Products', products=page['items'], page=page,
+                               filters=filters, wholesalers=wholesalers, bulk_form=bulk_form)
     except SQLAlchemyError as e:
         current_app.logger.error(f"Database error in products route: {str(e)}")
         flash(f"An error occurred while retrieving products: {str(e)}")
-        return render_template('products.html', title='Products', products=[], bulk_form=bulk_form)
+        return render_template('products.html', title='Products', products=[], page=None,
+                               filters=filters, wholesalers=wholesalers, bulk_form=bulk_form)
+
+@bp.route('/api/products')
+@login_required
+def products_api():
+    """JSON variant of the products listing, keyset paginated on (name, id)"""
+    try:
+        page = product_page(product_filters_from_args(request.args))
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in products_api: {str(e)}")
+        return jsonify({'error': 'An error occurred while retrieving products'}), 500
+    return jsonify({
+        'products': [{
+            'id': p.id,
+            'product_id': p.product_id,
+            'name': p.name,
+            'size': p.size,
+            'price': p.price,
+            'wholesaler_id': p.wholesaler_id,
+            'wholesaler_name': p.wholesaler.name,
+            'available_in_store': p.available_in_store
+        } for p in page['items']],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+        'per_page': page['per_page']
+    })
+
+PRODUCTS_PER_PAGE = 50
+MAX_PRODUCTS_PER_PAGE = 200
+
+def product_filters_from_args(args):
+    """Read the products listing filters and cursors from the query string"""
+    available = args.get('available', '')
+    return {
+        'q': args.get('q', '').strip(),
+        'wholesaler_id': args.get('wholesaler_id', type=int),
+        'available': available if available in ('1', '0') else '',
+        'per_page': max(1, min(args.get('per_page', PRODUCTS_PER_PAGE, type=int), MAX_PRODUCTS_PER_PAGE)),
+        'after': args.get('after'),
+        'before': args.get('before')
+    }
+
+def product_page(filters):
+    """One keyset page of products ordered by (name, id), filtered in SQL"""
+    query = Product.query.options(joinedload(Product.wholesaler))
+    if filters['q']:
+        pattern = f"%{filters['q']}%"
+        query = query.filter(or_(Product.name.ilike(pattern), Product.product_id.ilike(pattern)))
+    if filters['wholesaler_id']:
+        query = query.filter(Product.wholesaler_id == filters['wholesaler_id'])
+    if filters['available'] == '1':
+        query = query.filter(Product.available_in_store.isnot(False))
+    elif filters['available'] == '0':
+        query = query.filter(Product.available_in_store.is_(False))
+    return keyset_paginate(query, [Product.name, Product.id], lambda p: (p.name, p.id),
+                           filters['per_page'], after=filters['after'], before=filters['before'])
 
 
 import tempfile
@@ -326,6 +413,7 @@ def add_product():
         )
         db.session.add(product)
         db.session.commit()
+        invalidate_catalog_index()
         flash('Product added successfully!')
         return redirect(url_for('main.products'))
     
@@ -338,16 +426,8 @@ def add_product():
                     # Save uploaded file to temporary location
                     file.save(temp_file.name)
                     
-                    # Process the Excel file
-                    products = process_excel_file(temp_file.name)
-                    
-                    # Add products to database
-                    for product_data in products:
-                        product = Product(**product_data)
-                        db.session.add(product)
-                    
-                    db.session.commit()
-                    flash(f'{len(products)} products added successfully!', 'success')
+                    # Validate and upsert the Excel file
+                    run_bulk_import(temp_file.name, bulk_form.mode.data)
                     
                 except Exception as e:
                     db.session.rollback()
@@ -362,40 +442,61 @@ def add_product():
     return render_template('product_form.html', 
                          title='Add Product', 
                          form=form, 
-                         bulk_form=bulk_form)
+                         bulk_form=bulk_form,
+                         stream_chunk_size=STREAM_CHUNK_SIZE)
 
 def process_excel_file(file_path):
     try:
-        df = pd.read_excel(file_path)
-        required_columns = ['product_id', 'name', 'size', 'price', 'wholesaler_id']
-        
-        if not all(col in df.columns for col in required_columns):
-            raise ValueError("Excel file must contain columns: " + ", ".join(required_columns))
-        
-        products = []
-        for _, row in df.iterrows():
-            try:
-                wholesaler = Wholesaler.query.get(int(row['wholesaler_id']))
-                if not wholesaler:
-                    raise ValueError(f"Wholesaler with ID {row['wholesaler_id']} not found")
-                
-                product_data = {
-                    'product_id': str(row['product_id']),
-                    'name': str(row['name']),
-                    'size': str(row['size']),
-                    'price': float(row['price']),
-                    'wholesaler_id': wholesaler.id
-                }
-                products.append(product_data)
-            except Exception as e:
-                current_app.logger.error(f"Error processing row: {row}. Error: {str(e)}")
-                raise
-        
-        return products
+        return import_products_from_excel(file_path)
     except Exception as e:
         current_app.logger.error(f"Error processing Excel file: {str(e)}")
         raise
 
+def run_bulk_import(file_path, mode='standard'):
+    """Run a bulk product import in the requested mode and flash the outcome"""
+    try:
+        if mode == 'stream':
+            try:
+                result = stream_import_products(file_path)
+            except Exception:
+                # Chunks committed so far are kept and checkpointed
+                flash('Import stopped part way. Upload the same file again to continue '
+                      'from the last committed row.', 'warning')
+                raise
+        elif mode == 'multi':
+            result = parallel_import_products(file_path)
+            db.session.commit()
+        elif mode == 'diff':
+            result = diff_import_products(file_path)
+            db.session.commit()
+        else:
+            result = process_excel_file(file_path)
+            db.session.commit()
+    finally:
+        # Streamed imports commit chunk by chunk, so a failure can leave some rows written
+        invalidate_catalog_index()
+    flash_import_result(result)
+    return result
+
+def flash_import_result(result, max_errors=10):
+    """Flash the import summary and the first few row errors"""
+    if result.get('resumed_from_row'):
+        flash(f"Resumed a previous import from row {result['resumed_from_row']}.", 'info')
+    if 'updated' in result:
+        flash(f"{result['inserted']} added, {result['updated']} updated ({result['repriced']} price changes), "
+              f"{result['removed']} marked unavailable, {result['unchanged']} unchanged.", 'success')
+    else:
+        flash(f"{result['imported']} of {result['processed']} products imported successfully!", 'success')
+    errors = result['errors']
+    error_count = result.get('error_count', len(errors))
+    if error_count:
+        details = '; '.join(
+            f"{e['sheet'] + ' ' if e.get('sheet') else ''}row {e['row']}: {e['error']}"
+            for e in errors[:max_errors]
+        )
+        more = f" (and {error_count - max_errors} more)" if error_count > max_errors else ''
+        flash(f'{error_count} rows were skipped - {details}{more}', 'warning')
+
 @bp.route('/product/<int:product_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_product(product_id):
@@ -405,12 +506,20 @@ def edit_product(product_id):
     form.wholesaler.choices = [(w.id, w.name) for w in Wholesaler.query.all()]
     
     if form.validate_on_submit():
+        if product.price != form.price.data:
+            db.session.add(ProductPriceHistory(
+                product_id=product.id,
+                old_price=product.price,
+                new_price=form.price.data,
+                source='manual'
+            ))
         product.product_id = form.product_id.data
         product.name = form.name.data
         product.size = form.size.data
         product.price = form.price.data
         product.wholesaler_id = form.wholesaler.data
         db.session.commit()
+        invalidate_catalog_index()
         flash('Product updated successfully!')
         return redirect(url_for('main.products'))
     
@@ -421,18 +530,13 @@ def edit_product(product_id):
 @bp.route('/product/<int:product_id>/delete', methods=['POST'])
 @login_required
 def delete_product(product_id):
-    product = Product.query.options(joinedload(Product.order_items)).get_or_404(product_id)
-    
-    # Delete associated order list items
-    for order_item in product.order_items:
-        db.session.delete(order_item)
-    
-    db.session.delete(product)
-    
     try:
+        if not delete_products_by_id([product_id]):
+            abort(404)
         db.session.commit()
+        invalidate_catalog_index()
         flash('Product deleted successfully!')
-    except Exception as e:
+    except SQLAlchemyError as e:
         db.session.rollback()
         flash(f'An error occurred while deleting the product: {str(e)}', 'error')
     
@@ -441,32 +545,96 @@ def delete_product(product_id):
 @bp.route('/products/delete', methods=['POST'])
 @login_required
 def delete_multiple_products():
-    product_ids = request.form.getlist('product_ids[]')
-    
-    products = Product.query.filter(Product.id.in_(product_ids)).options(joinedload(Product.order_items)).all()
-    
-    for product in products:
-        for order_item in product.order_items:
-            db.session.delete(order_item)
-        db.session.delete(product)
+    product_ids = [int(i) for i in request.form.getlist('product_ids[]') if i.isdigit()]
     
     try:
+        deleted = delete_products_by_id(product_ids)
         db.session.commit()
-        flash(f'{len(products)} products deleted successfully!')
-    except Exception as e:
+        invalidate_catalog_index()
+        flash(f'{deleted} products deleted successfully!')
+    except SQLAlchemyError as e:
         db.session.rollback()
         flash(f'An error occurred while deleting products: {str(e)}', 'error')
     
     return redirect(url_for('main.products'))
 
+ORDER_LIST_SECTIONS = ('pending', 'recent', 'archive')
+ORDER_LIST_SECTION_TITLES = {'pending': 'Pending', 'recent': 'Recently Finalized', 'archive': 'Archive'}
+ORDER_LIST_SECTION_PER_PAGE = 20
+RECENT_ORDER_LIST_DAYS = 30
+ORDER_LIST_TOTALS_CAP = 1000
+
+def order_list_section_filter(section, cutoff):
+    """SQL condition selecting the order lists of one list_order_lists section"""
+    if section == 'pending':
+        return OrderList.status == 'pending'
+    if section == 'recent':
+        return and_(OrderList.status == 'finalized', OrderList.date >= cutoff)
+    return and_(OrderList.status == 'finalized', OrderList.date < cutoff)
+
+def order_list_section_page(section, cutoff, after=None, before=None):
+    """One keyset page of a section, newest first, backed by ix_order_list_status_date_id"""
+    query = OrderList.query.options(joinedload(OrderList.wholesaler))\
+        .filter(order_list_section_filter(section, cutoff))
+    return keyset_paginate(query, [OrderList.date, OrderList.id], lambda o: (o.date, o.id),
+                           ORDER_LIST_SECTION_PER_PAGE, after=after, before=before, descending=True)
+
+def order_list_section_totals(cutoff):
+    """
+    List count, line count and value of each section from the lists' stored
+    item_count and total_value. Each section is summed over at most
+    ORDER_LIST_TOTALS_CAP of its newest lists, read through
+    ix_order_list_status_date_id, so a page view never aggregates the whole
+    history. A section over the cap has exact False and no line or value totals.
+    """
+    totals = {}
+    for section in ORDER_LIST_SECTIONS:
+        newest = db.session.query(OrderList.item_count, OrderList.total_value)\
+            .filter(order_list_section_filter(section, cutoff))\
+            .order_by(OrderList.date.desc(), OrderList.id.desc())\
+            .limit(ORDER_LIST_TOTALS_CAP + 1).subquery()
+        lists, lines, value = db.session.query(
+            func.count(),
+            func.coalesce(func.sum(newest.c.item_count), 0),
+            func.coalesce(func.sum(newest.c.total_value), 0)
+        ).one()
+        exact = lists <= ORDER_LIST_TOTALS_CAP
+        totals[section] = {'lists': min(lists, ORDER_LIST_TOTALS_CAP), 'exact': exact,
+                           'lines': int(lines) if exact else None,
+                           'value': float(value) if exact else None}
+    return totals
 
 @bp.route('/list_order_lists')
 @login_required
 def list_order_lists():
-    daily_order_lists = OrderList.query.join(Wholesaler).filter(Wholesaler.is_daily == True).all()
-    monthly_order_lists = OrderList.query.join(Wholesaler).filter(Wholesaler.is_daily == False).all()
-    return render_template('list_order_lists.html', title='Order Lists',
-                           daily_order_lists=daily_order_lists, monthly_order_lists=monthly_order_lists)
+    """Order lists split into sections; only pending is loaded with the page"""
+    cutoff = datetime.utcnow().date() - timedelta(days=RECENT_ORDER_LIST_DAYS)
+    try:
+        totals = order_list_section_totals(cutoff)
+        pending = order_list_section_page('pending', cutoff,
+                                          after=request.args.get('after'), before=request.args.get('before'))
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in list_order_lists: {str(e)}")
+        flash('An error occurred while loading the order lists.', 'error')
+        return redirect(url_for('main.index'))
+    return render_template('list_order_lists.html', title='Order Lists', sections=ORDER_LIST_SECTIONS,
+                           section_titles=ORDER_LIST_SECTION_TITLES, totals=totals, pending=pending,
+                           recent_days=RECENT_ORDER_LIST_DAYS)
+
+@bp.route('/list_order_lists/<string:section>')
+@login_required
+def order_list_section(section):
+    """HTML fragment with one page of a section, fetched when the section is opened"""
+    if section not in ORDER_LIST_SECTIONS:
+        abort(404)
+    cutoff = datetime.utcnow().date() - timedelta(days=RECENT_ORDER_LIST_DAYS)
+    try:
+        page = order_list_section_page(section, cutoff,
+                                       after=request.args.get('after'), before=request.args.get('before'))
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in order_list_section: {str(e)}")
+        return '<p class="text-danger">An error occurred while loading this section.</p>', 500
+    return render_template('order_list_section.html', section=section, page=page)
 
 @bp.route('/wholesalers')
 @login_required
@@ -485,11 +653,12 @@ def list_wholesalers():
 @login_required
 def delete_wholesaler(id):
     try:
-        wholesaler = Wholesaler.query.get_or_404(id)
-        db.session.delete(wholesaler)
+        if not delete_wholesaler_by_id(id):
+            abort(404)
         db.session.commit()
+        invalidate_catalog_index()
         flash('Wholesaler deleted successfully!')
-    except Exception as e:
+    except SQLAlchemyError as e:
         db.session.rollback()
         current_app.logger.error(f"Error deleting wholesaler: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -508,29 +677,12 @@ def create_order_list():
         product = Product.query.get(form.product_id.data)
         if product:
             order_type = 'daily' if product.wholesaler.is_daily else 'monthly'
-            order_list = OrderList.query.filter_by(
-                wholesaler_id=product.wholesaler_id,
-                type=order_type,
-                status='pending'
-            ).first()
-            
-            if not order_list:
-                order_list = OrderList(
-                    wholesaler_id=product.wholesaler_id,
-                    type=order_type,
-                    status='pending',
-                    date=datetime.utcnow().date()
-                )
-                db.session.add(order_list)
-            
-            order_item = OrderListItem(
-                order_list=order_list,
-                product_id=product.id,
-                quantity=form.quantity.data
-            )
-            db.session.add(order_item)
-            
             try:
+                add_to_pending_lists([{
+                    'key': (product.wholesaler_id, order_type),
+                    'product_id': product.id,
+                    'quantity': form.quantity.data
+                }])
                 db.session.commit()
                 flash(f'Added {form.quantity.data} of {product.name} to the {order_type} order list.', 'success')
             except SQLAlchemyError as e:
@@ -546,33 +698,46 @@ def create_order_list():
 @bp.route('/finalize_order_list/<string:list_type>', methods=['POST'])
 @login_required
 def finalize_order_list(list_type):
-    if list_type not in ['daily', 'monthly']:
+    """
+    Finalize the pending lists of one type ('daily', 'monthly' or 'all').
+    An optional JSON body {"wholesaler_ids": [...]} limits it to those
+    wholesalers. Responds with per-wholesaler line counts and totals.
+    """
+    list_types = {'daily': ['daily'], 'monthly': ['monthly'], 'all': ['daily', 'monthly']}.get(list_type)
+    if list_types is None:
         return jsonify({'success': False, 'message': 'Invalid list type'}), 400
-    
-    orders = OrderList.query.filter_by(type=list_type, status='pending').all()
-    for order in orders:
-        order.status = 'finalized'
-        order.finalized_date = datetime.utcnow()
-    db.session.commit()
-    
-    return jsonify({'success': True, 'message': f'{list_type.capitalize()} orders finalized'})
+
+    data = request.get_json(silent=True) or {}
+    wholesaler_ids = data.get('wholesaler_ids')
+    if wholesaler_ids is not None and (not isinstance(wholesaler_ids, list) or
+                                       not all(isinstance(w, int) for w in wholesaler_ids)):
+        return jsonify({'success': False, 'message': 'wholesaler_ids must be a list of ids'}), 400
+
+    try:
+        summary = finalize_pending_lists(list_types, wholesaler_ids)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in finalize_order_list: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while finalizing the order lists'}), 500
+
+    label = 'All' if list_type == 'all' else list_type.capitalize()
+    return jsonify(dict(summary, success=True, message=f'{label} orders finalized'))
 
 
+ORDER_HISTORY_PER_PAGE = 10
+ORDER_HISTORY_COUNT_CAP = 10000
+
 @bp.route('/order_history')
 @login_required
 def order_history():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10  # Number of orders per page
-    
     # Filtering
     order_type = request.args.get('type', 'all')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    # Base query
-    query = OrderList.query.options(
-        joinedload(OrderList.items).joinedload(OrderListItem.product)
-    )
+    # Base query; counts and totals are stored on order_list, so items are not loaded
+    query = OrderList.query.options(joinedload(OrderList.wholesaler))
     if order_type != 'all':
         query = query.filter(OrderList.type == order_type)
     if start_date:
@@ -580,19 +745,27 @@ def order_history():
     if end_date:
         query = query.filter(OrderList.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
     
-    # Sorting
+    # Sorting; the id breaks ties so every row has a unique keyset position
     sort_by = request.args.get('sort_by', 'date')
     sort_order = request.args.get('sort_order', 'desc')
     
-    if sort_by == 'date':
-        query = query.order_by(desc(OrderList.date) if sort_order == 'desc' else OrderList.date)
-    elif sort_by == 'wholesaler':
-        query = query.join(Wholesaler).order_by(desc(Wholesaler.name) if sort_order == 'desc' else Wholesaler.name)
+    if sort_by == 'wholesaler':
+        query = query.join(Wholesaler)
+        columns = [Wholesaler.name, OrderList.id]
+        key = lambda order: (order.wholesaler.name, order.id)
+    else:
+        sort_by = 'date'
+        columns = [OrderList.date, OrderList.id]
+        key = lambda order: (order.date, order.id)
     
-    # Pagination
-    orders = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Keyset pagination; a capped count keeps the total cheap on large histories
+    total, total_exact = capped_count(query, ORDER_HISTORY_COUNT_CAP)
+    page = keyset_paginate(query, columns, key, ORDER_HISTORY_PER_PAGE,
+                           after=request.args.get('after'), before=request.args.get('before'),
+                           descending=sort_order == 'desc')
     
-    return render_template('order_history.html', title='Order History', orders=orders,
+    return render_template('order_history.html', title='Order History', orders=page['items'], page=page,
+                           total=total, total_exact=total_exact,
                            order_type=order_type, start_date=start_date, end_date=end_date,
                            sort_by=sort_by, sort_order=sort_order)
 
@@ -600,24 +773,7 @@ def order_history():
 @login_required
 def get_order_lists():
     try:
-        daily_orders = OrderList.query.filter_by(type='daily', status='pending').all()
-        monthly_orders = OrderList.query.filter_by(type='monthly', status='pending').all()
-        
-        def format_order(order):
-            return {
-                'id': order.id,
-                'wholesaler_name': order.wholesaler.name,
-                'items': [{
-                    'product_name': item.product.name,
-                    'quantity': item.quantity,
-                    'comment': item.comment
-                } for item in order.items]
-            }
-        
-        return jsonify({
-            'daily': [format_order(order) for order in daily_orders],
-            'monthly': [format_order(order) for order in monthly_orders]
-        })
+        return jsonify(pending_order_lists())
     except SQLAlchemyError as e:
         current_app.logger.error(f"Database error in get_order_lists: {str(e)}")
         return jsonify({'error': 'An error occurred while fetching order lists'}), 500
@@ -674,7 +830,9 @@ def add_wholesaler():
 def finalize_order(order_id):
     order = OrderList.query.get_or_404(order_id)
     order.status = 'finalized'
+    order.finalized_date = datetime.utcnow()
     db.session.commit()
+    forget_pending_lists(order.type, {order.wholesaler_id})
     flash('Order finalized successfully.', 'success')
     return redirect(url_for('main.daily_orders' if order.type == 'daily' else 'main.monthly_orders'))
 
@@ -690,7 +848,14 @@ def edit_order(order_id):
     if request.method == 'POST':
         # Update order details
         order.status = request.form.get('status')
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # uq_order_list_pending: the wholesaler already has a pending list of this type
+            db.session.rollback()
+            flash(f'{order.wholesaler.name} already has a pending {order.type} order list. '
+                  'Finalize or delete it before reopening this one.', 'error')
+            return redirect(url_for('main.edit_order', order_id=order.id))
         flash('Order updated successfully.', 'success')
         return redirect(url_for('main.view_order', order_id=order.id))
     return render_template('edit_order.html', order=order)
@@ -750,42 +915,14 @@ def sales_analytics():
             start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
 
         # Get overall summary
-        summary = db.session.query(
-            func.sum(DailySales.total_actual).label('total_sales'),
-            func.avg(DailySales.total_actual).label('avg_daily_sales'),
-            func.count(DailySales.id).label('transaction_count'),
-            func.sum(DailySales.overall_discrepancy).label('total_discrepancy'),
-            func.sum(DailySales.front_register_cash + DailySales.back_register_cash).label('total_cash'),
-            func.sum(DailySales.credit_card_total).label('total_card'),
-            func.sum(DailySales.otc1_total + DailySales.otc2_total).label('total_otc')
-        ).filter(
-            DailySales.date.between(start_date, end_date)
-        ).first()
-
-        # Day of week analysis
-        day_of_week = db.session.query(
-            func.extract('dow', DailySales.date).label('day_of_week'),
-            func.sum(DailySales.total_actual).label('total_sales'),
-            func.count(DailySales.id).label('transaction_count')
-        ).filter(
-            DailySales.date.between(start_date, end_date)
-        ).group_by(
-            func.extract('dow', DailySales.date)
-        ).order_by(
-            'day_of_week'
-        ).all()
-
-        # Monthly analysis
-        monthly = db.session.query(
-            func.extract('month', DailySales.date).label('month'),
-            func.sum(DailySales.total_actual).label('total_sales'),
-            func.avg(DailySales.total_actual).label('avg_daily_sales'),
-            func.count(DailySales.id).label('transaction_count')
-        ).group_by(
-            func.extract('month', DailySales.date)
-        ).order_by(
-            'month'
-        ).all()
+        summary = sales_summary(start_date, end_date)
+
+        # The monthly chart covers the twelve months ending with end_date
+        month_index = end_date.year * 12 + end_date.month - 12
+        monthly_start = date(month_index // 12, month_index % 12 + 1, 1)
+
+        # One rollup read, at most a row per day, feeds both charts
+        daily_totals = daily_sales_totals(min(start_date, monthly_start), end_date)
 
         # Format data for charts
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -798,10 +935,12 @@ def sales_analytics():
             'transactions': [0] * 7
         }
 
-        for day in day_of_week:
-            idx = int(day.day_of_week)
-            weekday_data['sales'][idx] = float(day.total_sales)
-            weekday_data['transactions'][idx] = int(day.transaction_count)
+        for day in daily_totals:
+            if day.date < start_date:
+                continue
+            idx = day.date.weekday()  # Monday is 0, matching days
+            weekday_data['sales'][idx] += float(day.total_sales)
+            weekday_data['transactions'][idx] += int(day.report_count)
 
         monthly_data = {
             'labels': months,
@@ -810,19 +949,24 @@ def sales_analytics():
             'transactions': [0] * 12
         }
 
-        for month in monthly:
-            idx = int(month.month) - 1  # Convert 1-based month to 0-based index
-            monthly_data['sales'][idx] = float(month.total_sales)
-            monthly_data['avg_sales'][idx] = float(month.avg_daily_sales)
-            monthly_data['transactions'][idx] = int(month.transaction_count)
+        for day in daily_totals:
+            if day.date < monthly_start:
+                continue
+            idx = day.date.month - 1  # Convert 1-based month to 0-based index
+            monthly_data['sales'][idx] += float(day.total_sales)
+            monthly_data['transactions'][idx] += int(day.report_count)
+
+        for idx, count in enumerate(monthly_data['transactions']):
+            if count:
+                monthly_data['avg_sales'][idx] = monthly_data['sales'][idx] / count
 
         return render_template(
             'analytics/sales_analytics.html',
             summary={
-                'total_sales': float(summary.total_sales) if summary.total_sales else 0,
-                'avg_daily_sales': float(summary.avg_daily_sales) if summary.avg_daily_sales else 0,
-                'transaction_count': int(summary.transaction_count) if summary.transaction_count else 0,
-                'total_discrepancy': float(summary.total_discrepancy) if summary.total_discrepancy else 0,
+                'total_sales': float(summary.total_sales),
+                'avg_daily_sales': float(summary.total_sales) / summary.report_count if summary.report_count else 0,
+                'transaction_count': int(summary.report_count),
+                'total_discrepancy': float(summary.total_discrepancy),
                 'payment_methods': {
                     'cash': float(summary.total_cash) if summary.total_cash else 0,
                     'card': float(summary.total_card) if summary.total_card else 0,
@@ -854,6 +998,44 @@ from app.models import (
 )
 # app/main/routes.py
 
+# Chart payload bounds for /analytics/trends, whatever the date range
+TREND_POINTS = 400
+TREND_MIN_POINTS = 10
+TREND_MAX_POINTS = 2000
+
+@bp.route('/analytics/trends')
+@login_required
+def analytics_trends():
+    """
+    Sales and order spend per day, week or month as parallel arrays for
+    Chart.js; ?series=sales,orders picks the series, ?period the bucket size
+    and ?points the most labels to return (downsampled with LTTB)
+    """
+    if not current_user.role == 'owner':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+
+    try:
+        today = datetime.now().date()
+        start_date = today.replace(day=1)
+        end_date = today
+        if request.args.get('end_date'):
+            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
+        if request.args.get('start_date'):
+            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
+        if start_date > end_date:
+            raise ValueError('start_date is after end_date')
+
+        series = tuple(name for name in request.args.get('series', ','.join(TREND_SERIES)).split(',') if name)
+        points = max(TREND_MIN_POINTS, min(request.args.get('points', TREND_POINTS, type=int), TREND_MAX_POINTS))
+        trend = get_trend_data(start_date, end_date, request.args.get('period', 'daily'), series, points)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in analytics trends: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while loading trends'}), 500
+
+    return jsonify({'success': True, **trend})
+
 @bp.route('/analytics/orders')
 @login_required
 def order_analytics():
@@ -871,41 +1053,26 @@ def order_analytics():
         if request.args.get('start_date'):
             start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
 
-        # Get all orders for the period
-        orders = db.session.query(OrderList).filter(
-            OrderList.date.between(start_date, end_date)
-        ).options(
-            joinedload(OrderList.items).joinedload(OrderListItem.product)
-        ).all()
-
-        # Calculate basic metrics
-        total_orders = len(orders)
-        total_value = sum(
-            item.quantity * item.product.price
-            for order in orders
-            for item in order.items
-        )
-        pending_orders = sum(1 for order in orders if order.status == 'pending')
+        # Weekday totals and the range totals, from the materialized views
+        weekday_values = [0] * 7
+        weekday_counts = [0] * 7
+        total_orders = 0
+        total_value = 0.0
+        for row in order_weekday_totals(start_date, end_date):
+            idx = int(row.weekday) - 1  # ISO weekday, Monday is 1
+            weekday_values[idx] = float(row.total_value)
+            weekday_counts[idx] = int(row.list_count)
+            total_orders = int(row.all_lists)
+            total_value = float(row.all_value)
 
         # Prepare summary
         summary = {
             'total_orders': total_orders,
             'total_value': total_value,
-            'pending_orders': pending_orders,
+            'pending_orders': pending_list_count(start_date, end_date),
             'avg_order_value': total_value / total_orders if total_orders > 0 else 0
         }
 
-        # Initialize weekday counters
-        weekday_values = [0] * 7
-        weekday_counts = [0] * 7
-
-        # Calculate weekday statistics
-        for order in orders:
-            weekday = order.date.weekday()
-            order_value = sum(item.quantity * item.product.price for item in order.items)
-            weekday_values[weekday] += order_value
-            weekday_counts[weekday] += 1
-
         # Prepare chart data
         chart_data = {
             'labels': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
@@ -913,33 +1080,13 @@ def order_analytics():
             'orders': weekday_counts
         }
 
-        # Calculate top products
-        product_totals = {}
-        for order in orders:
-            for item in order.items:
-                if item.product_id not in product_totals:
-                    product_totals[item.product_id] = {
-                        'name': item.product.name,
-                        'quantity': 0,
-                        'value': 0
-                    }
-                product_totals[item.product_id]['quantity'] += item.quantity
-                product_totals[item.product_id]['value'] += item.quantity * item.product.price
-
-        # Sort and format top products
-        top_products = sorted(
-            product_totals.values(),
-            key=lambda x: x['value'],
-            reverse=True
-        )[:5]
-
-        # Add profit calculation
+        # Top products at the price each line was ordered at, with profit
         products = [{
-            'name': p['name'],
-            'quantity': p['quantity'],
-            'value': p['value'],
-            'profit': p['value'] * 0.4
-        } for p in top_products]
+            'name': name,
+            'quantity': int(quantity),
+            'value': float(value),
+            'profit': float(value) * 0.4
+        } for name, quantity, value in top_ordered_products(start_date, end_date)]
 
         return render_template(
             'analytics/order_analytics.html',
@@ -1028,16 +1175,14 @@ def edit_customer_order(order_id):
 @bp.route('/delete_customer_order/<int:order_id>', methods=['POST'])
 @login_required
 def delete_customer_order(order_id):
-    order = CustomerOrder.query.get_or_404(order_id)
-    # First, delete all related order items
-    for item in order.items:
-        db.session.delete(item)
-    # Then, delete the order itself
-    db.session.delete(order)
     try:
+        # Order items are removed by ON DELETE CASCADE
+        result = db.session.execute(delete(CustomerOrder).where(CustomerOrder.id == order_id))
+        if not result.rowcount:
+            abort(404)
         db.session.commit()
         flash('Order deleted successfully.')
-    except Exception as e:
+    except SQLAlchemyError as e:
         db.session.rollback()
         flash(f'An error occurred while deleting the order: {str(e)}', 'error')
     return redirect(url_for('main.customer_orders'))
@@ -1087,9 +1232,18 @@ from flask_login import login_required
 @bp.route('/search_products')
 @login_required
 def search_products():
+    """Ranked autocomplete search over product name and product_id"""
     query = request.args.get('query', '')
-    products = Product.query.filter(Product.name.ilike(f'%{query}%')).limit(10).all()
-    return jsonify([{'id': p.id, 'name': p.name, 'price': p.price} for p in products])
+    filters = {
+        'limit': max(1, min(request.args.get('limit', 10, type=int), MAX_SEARCH_LIMIT)),
+        'wholesaler_id': request.args.get('wholesaler_id', type=int),
+        'available_only': request.args.get('available', '').lower() in ('1', 'true', 'yes')
+    }
+    # Served from the worker's in-memory index; SQL while it is (re)building
+    index = get_catalog_index()
+    if index is not None:
+        return jsonify(index.search(query, **filters))
+    return jsonify(search_catalog(query, **filters))
 
 @bp.route('/add_customer_order_item/<int:order_id>', methods=['GET', 'POST'])
 @login_required
@@ -1097,7 +1251,7 @@ def add_customer_order_item(order_id):
     order = CustomerOrder.query.get_or_404(order_id)
     form = CustomerOrderItemForm()
     if form.validate_on_submit():
-        product = Product.query.filter(Product.name.ilike(f"%{form.product_name.data}%")).first()
+        product = best_product_match(form.product_name.data)
         if product:
             item = CustomerOrderItem(
                 customer_order_id=order.id,
@@ -1133,6 +1287,7 @@ def add_product_to_order(order_id):
         )
         db.session.add(product)
         db.session.commit()
+        invalidate_catalog_index()
         flash('New product added successfully.', 'success')
         return redirect(url_for('main.add_customer_order_item', order_id=order_id))
     
@@ -1267,6 +1422,7 @@ def record_daily_sales():
             
             sales.calculate_discrepancies()
             db.session.add(sales)
+            add_sales_to_rollup(sales)
             db.session.commit()  # Commit first to get sales.id
 
             # Initialize CloudinaryStorage
@@ -1364,15 +1520,7 @@ def list_sales():
         query = query.filter(DailySales.date <= end_date)
     
     # Calculate summary statistics
-    summary = query.with_entities(
-        func.sum(DailySales.total_actual).label('total_sales'),
-        func.sum(DailySales.front_register_cash + DailySales.back_register_cash).label('total_cash'),
-        func.sum(DailySales.front_register_cash).label('total_front_cash'),
-        func.sum(DailySales.back_register_cash).label('total_back_cash'),
-        func.sum(DailySales.credit_card_total).label('total_card'),
-        func.sum(DailySales.otc1_total + DailySales.otc2_total).label('total_otc'),
-        func.sum(DailySales.overall_discrepancy).label('total_discrepancy')
-    ).first()
+    summary = sales_summary(start_date, end_date)
 
     # Get paginated results
     sales = query.order_by(DailySales.date.desc(), DailySales.report_time.desc()) \
@@ -1409,6 +1557,7 @@ def delete_sales(sales_id):
                 CloudinaryStorage.delete_file(document.cloudinary_public_id)
         
         # Delete the sales record and its documents
+        remove_sales_from_rollup(sales)
         db.session.delete(sales)
         db.session.commit()
         
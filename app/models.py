@@ -29,6 +29,10 @@ class User(UserMixin, db.Model):
     def is_owner(self):
         return self.role == 'owner'
 
+# A report whose overall discrepancy is more than this many dollars either
+# way is flagged; shared by the rollup, analytics and the sales pages
+DISCREPANCY_THRESHOLD = 10
+
 class DailySales(db.Model):
     __tablename__ = 'daily_sales'
     id = db.Column(db.Integer, primary_key=True)
@@ -62,7 +66,7 @@ class DailySales(db.Model):
     
     # Relationships
     employee = db.relationship('User', backref=db.backref('sales_records', lazy=True))
-    documents = db.relationship('SalesDocument', backref='sales_report', cascade='all, delete-orphan')
+    documents = db.relationship('SalesDocument', backref='sales_report', cascade='all, delete-orphan', passive_deletes=True)
 
     def calculate_discrepancies(self):
         """
@@ -97,18 +101,37 @@ class DailySales(db.Model):
 
     @property
     def has_significant_discrepancy(self):
-        """Check if there's a significant discrepancy (more than $10 either way)"""
-        return abs(self.overall_discrepancy) > 10
+        """Check if there's a significant discrepancy (more than DISCREPANCY_THRESHOLD either way)"""
+        return abs(self.overall_discrepancy) > DISCREPANCY_THRESHOLD
 
     def get_status(self):
         """Get the status based on discrepancy"""
-        if abs(self.overall_discrepancy) <= 10:
+        if not self.has_significant_discrepancy:
             return "Balanced"
         return "Discrepancy"
+class SalesDailyRollup(db.Model):
+    # Per day and employee sums of daily_sales, kept in step by
+    # utils.sales_rollup in the same transaction as each insert or delete
+    __tablename__ = 'sales_daily_rollup'
+    date = db.Column(db.Date, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+    discrepancy_count = db.Column(db.Integer, nullable=False, default=0)
+    total_expected = db.Column(db.Float, nullable=False, default=0.0)
+    total_actual = db.Column(db.Float, nullable=False, default=0.0)
+    front_register_cash = db.Column(db.Float, nullable=False, default=0.0)
+    back_register_cash = db.Column(db.Float, nullable=False, default=0.0)
+    credit_card_total = db.Column(db.Float, nullable=False, default=0.0)
+    otc1_total = db.Column(db.Float, nullable=False, default=0.0)
+    otc2_total = db.Column(db.Float, nullable=False, default=0.0)
+    front_register_discrepancy = db.Column(db.Float, nullable=False, default=0.0)
+    back_register_discrepancy = db.Column(db.Float, nullable=False, default=0.0)
+    overall_discrepancy = db.Column(db.Float, nullable=False, default=0.0)
+
 class SalesDocument(db.Model):
     __tablename__ = 'sales_documents'  # Note the plural form
     id = db.Column(db.Integer, primary_key=True)
-    sales_id = db.Column(db.Integer, db.ForeignKey('daily_sales.id'), nullable=False)
+    sales_id = db.Column(db.Integer, db.ForeignKey('daily_sales.id', ondelete='CASCADE'), nullable=False, index=True)
     document_type = db.Column(db.String(50), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
     cloudinary_public_id = db.Column(db.String(255), nullable=False)
@@ -124,39 +147,129 @@ class Wholesaler(db.Model):
     contact_person = db.Column(db.String(100))
     email = db.Column(db.String(120))
     phone = db.Column(db.String(20))
-    products = db.relationship('Product', back_populates='wholesaler')
-    order_lists = db.relationship('OrderList', back_populates='wholesaler')
+    # Deleting a wholesaler removes its products and order lists in the database
+    products = db.relationship('Product', back_populates='wholesaler', cascade='all', passive_deletes=True)
+    order_lists = db.relationship('OrderList', back_populates='wholesaler', cascade='all', passive_deletes=True)
 
 class Product(db.Model):
+    __table_args__ = (
+        # Trigram indexes for ranked autocomplete search (requires pg_trgm)
+        db.Index('ix_product_name_trgm', 'name',
+                 postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_product_product_id_trgm', 'product_id',
+                 postgresql_using='gin', postgresql_ops={'product_id': 'gin_trgm_ops'}),
+        # Keyset pagination of the products listing
+        db.Index('ix_product_name_id', 'name', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.String(20), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     size = db.Column(db.String(50))
     price = db.Column(db.Float, nullable=False)
-    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id'), nullable=False)
+    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id', ondelete='CASCADE'), nullable=False, index=True)
     wholesaler = db.relationship('Wholesaler', back_populates='products')
     available_in_store = db.Column(db.Boolean, default=True)
 
+class CatalogVersion(db.Model):
+    # Single row (id=1) bumped by a trigger on every write to product;
+    # workers compare it with their in-memory search index
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ColumnStoreVersion(db.Model):
+    # One row per column store table ('sales', 'orders'), bumped by triggers
+    # whenever history the store may already hold is changed; a mismatch
+    # with the store's manifest makes utils.column_store rebuild that table
+    __tablename__ = 'column_store_version'
+    name = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ProductPriceHistory(db.Model):
+    __tablename__ = 'product_price_history'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    old_price = db.Column(db.Float)
+    new_price = db.Column(db.Float, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    source = db.Column(db.String(20), default='import')  # 'import', 'manual'
+    product = db.relationship('Product', backref=db.backref('price_history', lazy='dynamic', passive_deletes=True))
+
 class OrderList(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
-    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id'), nullable=False)
+    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id', ondelete='CASCADE'), nullable=False, index=True)
     wholesaler = db.relationship('Wholesaler', back_populates='order_lists')
-    items = db.relationship('OrderListItem', back_populates='order_list', cascade='all, delete-orphan')
+    items = db.relationship('OrderListItem', back_populates='order_list', cascade='all, delete-orphan', passive_deletes=True)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'finalized'
     type = db.Column(db.String(10), nullable=False)  # 'daily' or 'monthly'
     finalized_date = db.Column(db.DateTime)
-    def total_value(self):
-        return sum(item.quantity * item.product.price for item in self.items)
+    # Maintained by triggers on order_list_item (see migration 9a4d61c2e8f7)
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_value = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    __table_args__ = (
+        # At most one pending list per wholesaler and type; target of the
+        # ON CONFLICT upsert in utils.order_lists
+        db.Index('uq_order_list_pending', 'wholesaler_id', 'type', unique=True,
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+        # Keyset pagination of the order history and the order list sections
+        db.Index('ix_order_list_date_id', 'date', 'id'),
+        db.Index('ix_order_list_status_date_id', 'status', 'date', 'id'),
+    )
 
 class OrderListItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_list_id = db.Column(db.Integer, db.ForeignKey('order_list.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    order_list_id = db.Column(db.Integer, db.ForeignKey('order_list.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text)
+    # Unit price at order time; set from the product on insert and kept in
+    # step with price changes only while the list is pending
+    price = db.Column(db.Float)
     order_list = db.relationship('OrderList', back_populates='items')
-    product = db.relationship('Product', backref='order_items')
+    product = db.relationship('Product', backref=db.backref('order_items', cascade='all', passive_deletes=True))
+    __table_args__ = (
+        # One line per product on a list; target of the ON CONFLICT merge in
+        # utils.order_lists
+        db.Index('uq_order_list_item_product', 'order_list_id', 'product_id', unique=True),
+    )
+
+class OrderSchedule(db.Model):
+    # When a wholesaler's pending list of one type is finalized. days is a
+    # cron-style "day-of-month month day-of-week" rule, e.g. "* * mon,thu"
+    # or "1 * *"; every_weeks > 1 keeps only every n-th matching week counted
+    # from anchor_date. At each cutoff the list is finalized and the next one
+    # opened; next_due_at is maintained by utils.scheduler.
+    __tablename__ = 'order_schedule'
+    id = db.Column(db.Integer, primary_key=True)
+    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id', ondelete='CASCADE'), nullable=False, index=True)
+    list_type = db.Column(db.String(10), nullable=False)  # 'daily' or 'monthly'
+    days = db.Column(db.String(100), nullable=False)
+    cutoff_time = db.Column(db.Time, nullable=False)
+    every_weeks = db.Column(db.Integer, nullable=False, default=1)
+    anchor_date = db.Column(db.Date)
+    prefill = db.Column(db.Boolean, nullable=False, default=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    next_due_at = db.Column(db.DateTime, index=True)
+    wholesaler = db.relationship('Wholesaler', backref=db.backref('schedules', cascade='all', passive_deletes=True))
+    __table_args__ = (
+        db.UniqueConstraint('wholesaler_id', 'list_type', name='uq_order_schedule_wholesaler_type'),
+    )
+
+class StandingOrderItem(db.Model):
+    # Lines copied onto each newly generated daily list of the wholesaler
+    __tablename__ = 'standing_order_item'
+    id = db.Column(db.Integer, primary_key=True)
+    wholesaler_id = db.Column(db.Integer, db.ForeignKey('wholesaler.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text)
+    wholesaler = db.relationship('Wholesaler', backref=db.backref('standing_order_items', passive_deletes=True))
+    product = db.relationship('Product', backref=db.backref('standing_order_items', passive_deletes=True))
+    __table_args__ = (
+        db.UniqueConstraint('wholesaler_id', 'product_id', name='uq_standing_order_item'),
+    )
 
 class CustomerOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -166,15 +279,17 @@ class CustomerOrder(db.Model):
     status = db.Column(db.String(20), default='pending')  # New field
     is_paid = db.Column(db.Boolean, default=False)
     total_amount = db.Column(db.Float, default=0.0)
-    items = db.relationship('CustomerOrderItem', backref='customer_order', lazy='dynamic')
+    items = db.relationship('CustomerOrderItem', backref='customer_order', lazy='dynamic',
+                            cascade='all, delete-orphan', passive_deletes=True)
 
 class CustomerOrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    customer_order_id = db.Column(db.Integer, db.ForeignKey('customer_order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)  # Can be null for custom products
+    customer_order_id = db.Column(db.Integer, db.ForeignKey('customer_order.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Can be null for custom products; deleting a product keeps the line and nulls the link
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True, index=True)
     custom_product_name = db.Column(db.String(100))  # For products not in stock
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')  # New field
-    product = db.relationship('Product', backref='customer_order_items')
+    product = db.relationship('Product', backref=db.backref('customer_order_items', passive_deletes=True))
 
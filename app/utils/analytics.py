@@ -1,101 +1,149 @@
 # app/utils/analytics.py
 
-from sqlalchemy import func, extract
-from collections import defaultdict
+import numpy as np
+from sqlalchemy import select, func, extract, cast, literal_column, or_, true, Date, DateTime
 from datetime import datetime, timedelta
-from app.models import DailySales, OrderList, OrderListItem, Product, Wholesaler
+from app.models import (DailySales, OrderList, OrderListItem, Product, Wholesaler, SalesDailyRollup,
+                        DISCREPANCY_THRESHOLD)
 from app import db
-
-def get_previous_period_sales(start_date, end_date):
-    """Get sales data for previous period"""
-    days_diff = (end_date - start_date).days
+from app.utils.column_store import SALES, ORDERS, ORDER_LINES, read_columns
+from app.utils.downsample import downsample_trend
+
+def _shift_year(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year + years, day=28)
+
+def comparison_periods(start_date, end_date, last_year=False):
+    """
+    The range, the period of equal length just before it and optionally the
+    same range a year earlier, as {'current'|'previous'|'last_year': (start, end)}
+    """
+    days = (end_date - start_date).days
     prev_end_date = start_date - timedelta(days=1)
-    prev_start_date = prev_end_date - timedelta(days=days_diff)
-
-    prev_sales = DailySales.query\
-        .filter(DailySales.date.between(prev_start_date, prev_end_date))\
-        .all()
+    periods = {
+        'current': (start_date, end_date),
+        'previous': (prev_end_date - timedelta(days=days), prev_end_date)
+    }
+    if last_year:
+        periods['last_year'] = (_shift_year(start_date, -1), _shift_year(end_date, -1))
+    return periods
+
+def _percent_change(current, previous):
+    return (current - previous) / abs(previous) * 100 if previous else None
+
+def compare_periods(start_date, end_date, last_year=False):
+    """
+    Sales and order KPIs for the range and its comparison periods (see
+    comparison_periods) in one statement: each KPI of each period is a
+    conditional aggregate (FILTER) over a scan of just the covered dates.
+    Returns {'periods': ..., 'current': {kpi: value}, 'previous': {...},
+    ['last_year': {...},] 'change': {kpi: % vs previous or None},
+    ['change_last_year': {...}]}
+    """
+    periods = comparison_periods(start_date, end_date, last_year)
+    r = SalesDailyRollup
+
+    kpis = {
+        'sales_total': (r.date, r.total_actual, func.sum),
+        'sales_count': (r.date, r.report_count, func.sum),
+        'sales_discrepancy': (r.date, r.overall_discrepancy, func.sum),
+        'orders_value': (OrderList.date, OrderList.total_value, func.sum),
+        'orders_count': (OrderList.date, OrderList.id, func.count)
+    }
+    columns = {'sales': [], 'orders': []}
+    for name, (start, end) in periods.items():
+        for kpi, (date_column, column, aggregate) in kpis.items():
+            columns[kpi.split('_')[0]].append(
+                func.coalesce(aggregate(column).filter(date_column.between(start, end)), 0).label(f'{name}__{kpi}')
+            )
+
+    sales = select(*columns['sales']).where(
+        or_(*[r.date.between(start, end) for start, end in periods.values()])
+    ).subquery()
+    orders = select(*columns['orders']).where(
+        or_(*[OrderList.date.between(start, end) for start, end in periods.values()])
+    ).subquery()
+    # Both sides are single-row aggregates; joining them keeps one round trip
+    row = db.session.execute(select(sales, orders).select_from(sales.join(orders, true()))).one()._mapping
+
+    result = {'periods': periods}
+    for name in periods:
+        result[name] = {kpi: float(row[f'{name}__{kpi}']) for kpi in kpis}
+    for name, key in (('previous', 'change'), ('last_year', 'change_last_year')):
+        if name in periods:
+            result[key] = {kpi: _percent_change(result['current'][kpi], result[name][kpi]) for kpi in kpis}
+    return result
+
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December')
+HOUR_LABELS = tuple(f'{hour:02d}:00' for hour in range(24))
+
+def load_sales_columns(start_date, end_date):
+    """
+    DailySales columns the sales analytics need for a date range, as NumPy
+    arrays keyed by name: closed days from the column store, the rest live
+    """
+    return read_columns(SALES, start_date, end_date)
+
+def load_order_columns(start_date, end_date):
+    """Date, wholesaler, stored value and pending flag of the order lists in a date range"""
+    return read_columns(ORDERS, start_date, end_date)
+
+def load_order_line_columns(start_date, end_date):
+    """Date, product, quantity and value (at line prices) of the order lines in a date range"""
+    return read_columns(ORDER_LINES, start_date, end_date)
+
+def _group_sums(keys, *values):
+    """Distinct keys and the per-key count and sums of each values array"""
+    unique, codes = np.unique(keys, return_inverse=True)
+    counts = np.bincount(codes, minlength=len(unique))
+    return unique, counts, [np.bincount(codes, weights=v, minlength=len(unique)) for v in values]
+
+def _bucket_stats(codes, values, labels):
+    """
+    Total, count, max, min and average of values grouped by codes (indexes
+    into labels), computed with vectorized group-by; empty buckets are left out
+    """
+    size = len(labels)
+    count = np.bincount(codes, minlength=size)
+    total = np.bincount(codes, weights=values, minlength=size)
+    low = np.full(size, np.inf)
+    high = np.full(size, -np.inf)
+    np.minimum.at(low, codes, values)
+    np.maximum.at(high, codes, values)
+    return {
+        labels[i]: {
+            'total': float(total[i]),
+            'count': int(count[i]),
+            'max': float(high[i]),
+            'min': float(low[i]),
+            'avg': float(total[i] / count[i])
+        } for i in np.flatnonzero(count)
+    }
 
-    return sum(sale.total_actual for sale in prev_sales) if prev_sales else 0
+def analyze_sales_patterns(sales):
+    """Analyze sales patterns by day, hour, and month from load_sales_columns()"""
+    days = sales['date'].astype(np.int64)
+    times = sales['report_time']
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    hour = (times - times.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+    month = sales['date'].astype('datetime64[M]').astype(np.int64) % 12
+    values = sales['total_actual']
 
-def get_previous_period_orders(start_date, end_date):
-    """Get order data for previous period"""
-    days_diff = (end_date - start_date).days
-    prev_end_date = start_date - timedelta(days=1)
-    prev_start_date = prev_end_date - timedelta(days=days_diff)
-
-    prev_orders = OrderList.query\
-        .filter(OrderList.date.between(prev_start_date, prev_end_date))\
-        .options(joinedload(OrderList.items))\
-        .all()
-
-    return sum(
-        item.quantity * item.product.price 
-        for order in prev_orders 
-        for item in order.items
-    ) if prev_orders else 0
-
-def analyze_sales_patterns(sales_data):
-    """Analyze sales patterns by day, hour, and month"""
-    patterns = {
-        'weekday': defaultdict(lambda: {
-            'total': 0,
-            'count': 0,
-            'max': 0,
-            'min': float('inf')
-        }),
-        'hourly': defaultdict(lambda: {
-            'total': 0,
-            'count': 0,
-            'max': 0,
-            'min': float('inf')
-        }),
-        'monthly': defaultdict(lambda: {
-            'total': 0,
-            'count': 0,
-            'max': 0,
-            'min': float('inf')
-        })
+    return {
+        'weekday': _bucket_stats(weekday, values, WEEKDAY_NAMES),
+        'hourly': _bucket_stats(hour, values, HOUR_LABELS),
+        'monthly': _bucket_stats(month, values, MONTH_NAMES)
     }
 
-    if sales_data:
-        for sale in sales_data:
-            # Weekday analysis
-            weekday = sale.date.strftime('%A')
-            patterns['weekday'][weekday]['total'] += sale.total_actual
-            patterns['weekday'][weekday]['count'] += 1
-            patterns['weekday'][weekday]['max'] = max(patterns['weekday'][weekday]['max'], sale.total_actual)
-            patterns['weekday'][weekday]['min'] = min(patterns['weekday'][weekday]['min'], sale.total_actual)
-
-            # Hourly analysis
-            hour = sale.report_time.strftime('%H:00')
-            patterns['hourly'][hour]['total'] += sale.total_actual
-            patterns['hourly'][hour]['count'] += 1
-            patterns['hourly'][hour]['max'] = max(patterns['hourly'][hour]['max'], sale.total_actual)
-            patterns['hourly'][hour]['min'] = min(patterns['hourly'][hour]['min'], sale.total_actual)
-
-            # Monthly analysis
-            month = sale.date.strftime('%B')
-            patterns['monthly'][month]['total'] += sale.total_actual
-            patterns['monthly'][month]['count'] += 1
-            patterns['monthly'][month]['max'] = max(patterns['monthly'][month]['max'], sale.total_actual)
-            patterns['monthly'][month]['min'] = min(patterns['monthly'][month]['min'], sale.total_actual)
-
-        # Calculate averages and handle min values
-        for pattern_type in patterns.values():
-            for stats in pattern_type.values():
-                if stats['count'] > 0:
-                    stats['avg'] = stats['total'] / stats['count']
-                    if stats['min'] == float('inf'):
-                        stats['min'] = stats['total']
-                else:
-                    stats['avg'] = 0
-                    stats['min'] = 0
-
-    return patterns
-
-def calculate_sales_metrics(sales_data, start_date, end_date):
-    """Calculate key sales metrics"""
+def calculate_sales_metrics(sales, start_date, end_date, comparison=None):
+    """
+    Calculate key sales metrics from load_sales_columns(); pass the
+    compare_periods() result when the caller already has it
+    """
     metrics = {
         'total_sales': 0,
         'prev_period_sales': 0,
@@ -110,26 +158,31 @@ def calculate_sales_metrics(sales_data, start_date, end_date):
         }
     }
 
-    if sales_data:
-        metrics['total_sales'] = sum(sale.total_actual for sale in sales_data)
-        metrics['total_discrepancy'] = sum(sale.overall_discrepancy for sale in sales_data)
-        metrics['transaction_count'] = len(sales_data)
-        metrics['avg_transaction'] = metrics['total_sales'] / metrics['transaction_count'] if metrics['transaction_count'] > 0 else 0
-        metrics['discrepancy_count'] = sum(1 for sale in sales_data if abs(sale.overall_discrepancy) > 10)
+    count = len(sales['total_actual'])
+    if count:
+        metrics['total_sales'] = float(sales['total_actual'].sum())
+        metrics['total_discrepancy'] = float(sales['overall_discrepancy'].sum())
+        metrics['transaction_count'] = count
+        metrics['avg_transaction'] = metrics['total_sales'] / count
+        metrics['discrepancy_count'] = int(np.count_nonzero(np.abs(sales['overall_discrepancy']) > DISCREPANCY_THRESHOLD))
 
         metrics['payment_totals'] = {
-            'cash': sum((sale.front_register_cash + sale.back_register_cash) for sale in sales_data),
-            'card': sum(sale.credit_card_total for sale in sales_data),
-            'otc': sum((sale.otc1_total + sale.otc2_total) for sale in sales_data)
+            'cash': float(sales['cash'].sum()),
+            'card': float(sales['card'].sum()),
+            'otc': float(sales['otc'].sum())
         }
 
         # Get previous period data
-        metrics['prev_period_sales'] = get_previous_period_sales(start_date, end_date)
+        comparison = comparison or compare_periods(start_date, end_date)
+        metrics['prev_period_sales'] = comparison['previous']['sales_total']
 
     return metrics
 
-def calculate_order_metrics(orders, start_date, end_date):
-    """Calculate key order metrics"""
+def calculate_order_metrics(orders, start_date, end_date, comparison=None):
+    """
+    Calculate key order metrics from load_order_columns(); pass the
+    compare_periods() result when the caller already has it
+    """
     metrics = {
         'total_orders_value': 0,
         'prev_period_value': 0,
@@ -138,123 +191,130 @@ def calculate_order_metrics(orders, start_date, end_date):
         'pending_orders_value': 0
     }
 
-    if orders:
-        metrics['total_orders'] = len(orders)
-        metrics['total_orders_value'] = sum(
-            item.quantity * item.product.price 
-            for order in orders 
-            for item in order.items
-        )
-
-        pending_orders = [o for o in orders if o.status == 'pending']
-        metrics['pending_orders'] = len(pending_orders)
-        metrics['pending_orders_value'] = sum(
-            item.quantity * item.product.price 
-            for order in pending_orders 
-            for item in order.items
-        )
+    count = len(orders['total_value'])
+    if count:
+        pending = orders['pending']
+        metrics['total_orders'] = count
+        metrics['total_orders_value'] = float(orders['total_value'].sum())
+        metrics['pending_orders'] = int(np.count_nonzero(pending))
+        metrics['pending_orders_value'] = float(orders['total_value'][pending].sum())
 
         # Get previous period data
-        metrics['prev_period_value'] = get_previous_period_orders(start_date, end_date)
+        comparison = comparison or compare_periods(start_date, end_date)
+        metrics['prev_period_value'] = comparison['previous']['orders_value']
 
     return metrics
 
 def analyze_top_products(start_date, end_date, limit=10):
     """Analyze top performing products"""
-    products = db.session.query(
-        Product,
-        func.coalesce(func.sum(OrderListItem.quantity), 0).label('quantity'),
-        func.coalesce(func.sum(OrderListItem.quantity * Product.price), 0).label('value')
-    ).select_from(OrderList)\
-     .join(OrderListItem)\
-     .join(Product)\
-     .filter(OrderList.date.between(start_date, end_date))\
-     .group_by(Product.id)\
-     .order_by(func.sum(OrderListItem.quantity * Product.price).desc())\
-     .limit(limit)\
-     .all()
+    lines = load_order_line_columns(start_date, end_date)
+    product_ids, _, (quantities, values) = _group_sums(lines['product_id'], lines['quantity'], lines['value'])
+    top = np.argsort(-values, kind='stable')[:limit]
+    names = dict(db.session.execute(
+        select(Product.id, Product.name).where(Product.id.in_(product_ids[top].tolist()))
+    ).all())
 
     return [{
-        'name': p[0].name,
-        'quantity': int(p[1]),
-        'value': float(p[2]),
-        'profit': float(p[2]) * 0.4  # 40% profit margin
-    } for p in products]
+        'name': names[int(product_ids[i])],
+        'quantity': int(quantities[i]),
+        'value': float(values[i]),
+        'profit': float(values[i]) * 0.4  # 40% profit margin
+    } for i in top if int(product_ids[i]) in names]
 
 def analyze_wholesaler_performance(start_date, end_date):
     """Analyze wholesaler performance"""
-    performance = db.session.query(
-        Wholesaler,
-        func.count(func.distinct(OrderList.id)).label('orders'),
-        func.coalesce(func.sum(OrderListItem.quantity * Product.price), 0).label('value')
-    ).select_from(Wholesaler)\
-     .join(OrderList)\
-     .join(OrderListItem)\
-     .join(Product)\
-     .filter(OrderList.date.between(start_date, end_date))\
-     .group_by(Wholesaler.id)\
-     .all()
+    orders = load_order_columns(start_date, end_date)
+    wholesaler_ids, counts, (values,) = _group_sums(orders['wholesaler_id'], orders['total_value'])
+    names = dict(db.session.execute(
+        select(Wholesaler.id, Wholesaler.name).where(Wholesaler.id.in_(wholesaler_ids.tolist()))
+    ).all())
 
     return [{
-        'name': w[0].name,
-        'orders': int(w[1]),
-        'value': float(w[2]),
-        'profit': float(w[2]) * 0.4
-    } for w in performance]
+        'name': names[int(w)],
+        'orders': int(count),
+        'value': float(value),
+        'profit': float(value) * 0.4
+    } for w, count, value in zip(wholesaler_ids, counts, values) if int(w) in names]
+
+# Trend period -> date_trunc unit and bucket label format
+TREND_PERIODS = {
+    'daily': ('day', '%Y-%m-%d'),
+    'weekly': ('week', '%Y-%m-%d'),  # labelled by the Monday starting the week
+    'monthly': ('month', '%Y-%m')
+}
+
+def _trend_sources(unit, start_date, end_date):
+    """Per-bucket total and count of each trend series, as selects keyed by bucket"""
+    def bucketed(date_column, *aggregates):
+        bucket = cast(func.date_trunc(unit, cast(date_column, DateTime)), Date)
+        return select(bucket.label('bucket'), *aggregates).where(
+            date_column.between(start_date, end_date)
+        ).group_by(bucket)
 
-def get_sales_trend_data(start_date, end_date, period='daily'):
-    """Get sales trend data for charts"""
-    sales_data = DailySales.query\
-        .filter(DailySales.date.between(start_date, end_date))\
-        .order_by(DailySales.date)\
-        .all()
-
-    trends = defaultdict(lambda: {'total': 0, 'count': 0})
+    return {
+        'sales': bucketed(
+            SalesDailyRollup.date,
+            func.sum(SalesDailyRollup.total_actual).label('total'),
+            func.sum(SalesDailyRollup.report_count).label('count')
+        ),
+        'orders': bucketed(
+            OrderList.date,
+            func.sum(OrderList.total_value).label('total'),
+            func.count().label('count')
+        )
+    }
 
-    for sale in sales_data:
-        key = sale.date.strftime('%Y-%m-%d')
-        if period == 'weekly':
-            week_start = sale.date - timedelta(days=sale.date.weekday())
-            key = week_start.strftime('%Y-%m-%d')
-        elif period == 'monthly':
-            key = sale.date.strftime('%Y-%m')
+TREND_SERIES = ('sales', 'orders')
+
+def get_trend_data(start_date, end_date, period='daily', series=TREND_SERIES, points=None):
+    """
+    Totals and counts of one or more series (sales, order spend) per day,
+    week or month, bucketed in SQL with date_trunc. Every bucket of the
+    range comes from generate_series, so gaps are zero-filled, and all
+    series are read in one statement. Returns parallel arrays for Chart.js:
+    {'labels': [...], 'series': {name: {'totals': [...], 'counts': [...]}}},
+    downsampled to about points labels when given.
+    """
+    if period not in TREND_PERIODS:
+        raise ValueError(f'Unknown trend period: {period}')
+    unknown = set(series) - set(TREND_SERIES)
+    if unknown:
+        raise ValueError(f"Unknown trend series: {', '.join(sorted(unknown))}")
+    unit, label_format = TREND_PERIODS[period]
+
+    buckets = select(cast(func.generate_series(
+        func.date_trunc(unit, cast(start_date, DateTime)),
+        func.date_trunc(unit, cast(end_date, DateTime)),
+        literal_column(f"interval '1 {unit}'")  # unit comes from TREND_PERIODS
+    ), Date).label('bucket')).subquery()
+
+    sources = _trend_sources(unit, start_date, end_date)
+    query = select(buckets.c.bucket)
+    joined = buckets
+    for name in series:
+        source = sources[name].subquery()
+        query = query.add_columns(func.coalesce(source.c.total, 0), func.coalesce(source.c.count, 0))
+        joined = joined.outerjoin(source, source.c.bucket == buckets.c.bucket)
+    rows = db.session.execute(query.select_from(joined).order_by(buckets.c.bucket)).all()
+
+    return downsample_trend({
+        'labels': [row[0].strftime(label_format) for row in rows],
+        'series': {
+            name: {
+                'totals': [float(row[1 + 2 * i]) for row in rows],
+                'counts': [int(row[2 + 2 * i]) for row in rows]
+            } for i, name in enumerate(series)
+        }
+    }, points)
 
-        trends[key]['total'] += sale.total_actual
-        trends[key]['count'] += 1
+def _single_trend(name, start_date, end_date, period, points):
+    trend = get_trend_data(start_date, end_date, period, series=(name,), points=points)
+    return {'labels': trend['labels'], **trend['series'][name]}
 
-    return {
-        'labels': list(trends.keys()),
-        'totals': [t['total'] for t in trends.values()],
-        'counts': [t['count'] for t in trends.values()]
-    }
+def get_sales_trend_data(start_date, end_date, period='daily', points=None):
+    """Get sales trend data for charts"""
+    return _single_trend('sales', start_date, end_date, period, points)
 
-def get_order_trend_data(start_date, end_date, period='daily'):
+def get_order_trend_data(start_date, end_date, period='daily', points=None):
     """Get order trend data for charts"""
-    orders = OrderList.query\
-        .filter(OrderList.date.between(start_date, end_date))\
-        .options(
-            joinedload(OrderList.items),
-            joinedload(OrderList.wholesaler)
-        )\
-        .order_by(OrderList.date)\
-        .all()
-
-    trends = defaultdict(lambda: {'total': 0, 'count': 0})
-
-    for order in orders:
-        key = order.date.strftime('%Y-%m-%d')
-        if period == 'weekly':
-            week_start = order.date - timedelta(days=order.date.weekday())
-            key = week_start.strftime('%Y-%m-%d')
-        elif period == 'monthly':
-            key = order.date.strftime('%Y-%m')
-
-        order_value = sum(item.quantity * item.product.price for item in order.items)
-        trends[key]['total'] += order_value
-        trends[key]['count'] += 1
-
-    return {
-        'labels': list(trends.keys()),
-        'totals': [t['total'] for t in trends.values()],
-        'counts': [t['count'] for t in trends.values()]
-    }
\ No newline at end of file
+    return _single_trend('orders', start_date, end_date, period, points)
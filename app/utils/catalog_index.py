@@ -0,0 +1,255 @@
+# app/utils/catalog_index.py
+
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Product, CatalogVersion
+from app import db
+
+NAME_SIMILARITY_THRESHOLD = 0.6   # share of query trigrams found in the name
+CODE_SIMILARITY_THRESHOLD = 0.3   # trigram similarity against product_id
+MAX_FUZZY_CANDIDATES = 5000
+
+_non_word = re.compile(r'[^0-9a-z]+')
+_non_word_or_nul = re.compile(r'[^0-9a-z\0]+')
+
+def _normalize(text):
+    return _non_word.sub(' ', (text or '').lower()).strip()
+
+def _normalize_all(texts):
+    """_normalize() of every text in one pass; database text never holds NUL"""
+    if not texts:
+        return []
+    joined = _non_word_or_nul.sub(' ', '\0'.join(text or '' for text in texts).lower())
+    return [text.strip() for text in joined.split('\0')]
+
+def _distinct_sorted(pairs):
+    """Drop repeated values from a sorted array"""
+    if len(pairs):
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    return pairs
+
+# Normalized text only holds these characters, so a trigram is a number
+# below len(_ALPHABET) ** 3 and the whole catalog is split into trigrams at once
+_ALPHABET = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+_CHAR_CODES = np.zeros(256, dtype=np.int64)
+_CHAR_CODES[np.frombuffer(_ALPHABET.encode('ascii'), dtype=np.uint8)] = np.arange(len(_ALPHABET))
+_GRAM_SPACE = len(_ALPHABET) ** 3
+
+def _gram_pairs(texts):
+    """
+    pg_trgm style trigrams (each word padded with two leading spaces and
+    one trailing space) of every normalized text, as arrays (trigram code,
+    text number) of distinct pairs sorted by code then text
+    """
+    size = len(texts)
+    if not size:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Padding every word as '  word ' puts three spaces between words; the
+    # windows ending in two spaces straddle words and are not trigrams
+    padded = ['  ' + text.replace(' ', '   ') + ' ' for text in texts]
+    chars = _CHAR_CODES[np.frombuffer(''.join(padded).encode('ascii'), dtype=np.uint8)]
+    owners = np.repeat(np.arange(size), [len(text) for text in padded])[:-2]
+    grams = chars[:-2] * len(_ALPHABET) ** 2 + chars[1:-1] * len(_ALPHABET) + chars[2:]
+    inside = (chars[1:-1] != 0) | (chars[2:] != 0)
+    pairs = _distinct_sorted(np.sort(grams[inside] * size + owners[inside]))
+    return pairs // size, pairs % size
+
+class _Postings:
+    """
+    Trigram inverted index over texts, stored as one array of text numbers
+    sorted by trigram with offsets[g]:offsets[g + 1] the texts holding g
+    """
+
+    def __init__(self, texts):
+        grams, owners = _gram_pairs(texts)
+        self.size = len(texts)
+        self.positions = owners.astype(np.uint32)
+        self.offsets = np.zeros(_GRAM_SPACE + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=_GRAM_SPACE), out=self.offsets[1:])
+        # Per text trigram count
+        self.sizes = np.bincount(owners, minlength=self.size)
+
+    def hits(self, grams):
+        """Per text, how many of the trigram codes it holds"""
+        lists = [self.positions[self.offsets[gram]:self.offsets[gram + 1]] for gram in grams]
+        if not lists:
+            return np.zeros(self.size, dtype=np.int64)
+        return np.bincount(np.concatenate(lists), minlength=self.size)
+
+class CatalogIndex:
+    """
+    Immutable in-memory search index over the product catalog.
+    Holds a sorted key list for prefix lookups (name, each name word and
+    product_id) and trigram inverted indexes for name and product_id.
+    Trigrams are interned to ids at build time; a search counts, per
+    product, the query trigrams its name and code hold, which gives the
+    similarity of every product without revisiting any product's text.
+    Results have the same shape as search.search_catalog().
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.products = [dict(row) for row in rows]
+        self.names = _normalize_all([product['name'] for product in self.products])
+        self.codes = _normalize_all([product['product_id'] for product in self.products])
+        self.name_grams = _Postings(self.names)
+        self.code_grams = _Postings(self.codes)
+
+        # Prefix keys: each product's name, code and name words, sorted,
+        # with key_positions[key_offsets[k]:key_offsets[k + 1]] the products of keys[k]
+        size = len(self.products)
+        words = [name.split() for name in self.names]
+        flat = self.names + self.codes + [word for name in words for word in name]
+        owners = np.concatenate((np.arange(size), np.arange(size),
+                                 np.repeat(np.arange(size), [len(name) for name in words])))
+        self.keys = sorted(set(flat))
+        key_ids = dict(zip(self.keys, range(len(self.keys))))
+        stride = max(size, 1)
+        pairs = np.fromiter(map(key_ids.__getitem__, flat), dtype=np.int64, count=len(flat)) * stride + owners
+        pairs = _distinct_sorted(np.sort(pairs))
+        self.key_positions = (pairs % stride).astype(np.uint32)
+        self.key_offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // stride, minlength=len(self.keys)), out=self.key_offsets[1:])
+        self.wholesaler_ids = np.array([p['wholesaler_id'] or 0 for p in self.products], dtype=np.int64)
+        self.unavailable = np.array([p['available_in_store'] is False for p in self.products], dtype=bool)
+        # Tie-break of equal scores, as in SQL: by name, then id
+        self.name_rank = np.empty(size, dtype=np.int64)
+        self.name_rank[[pos for _, _, pos in sorted(
+            (p['name'], p['id'], pos) for pos, p in enumerate(self.products))]] = np.arange(size)
+
+    def __len__(self):
+        return len(self.products)
+
+    def _key_range(self, low, high):
+        start = bisect_left(self.keys, low)
+        end = bisect_left(self.keys, high, lo=start)
+        return self.key_positions[self.key_offsets[start]:self.key_offsets[end]]
+
+    def search(self, term, limit=10, wholesaler_id=None, available_only=False):
+        term = _normalize(term)
+        if not term:
+            return []
+
+        # Mirror the SQL ranking: exact code, then prefix, then similarity
+        term_grams, _ = _gram_pairs([term])
+        name_sim = self.name_grams.hits(term_grams) / len(term_grams)
+        code_hits = self.code_grams.hits(term_grams)
+        code_sim = code_hits / (len(term_grams) + self.code_grams.sizes - code_hits)
+        score = np.maximum(name_sim, code_sim)
+        matched = (name_sim >= NAME_SIMILARITY_THRESHOLD) | (code_sim >= CODE_SIMILARITY_THRESHOLD)
+
+        # Exact and prefix matches straight from the sorted keys
+        prefixed = np.zeros(len(self.products), dtype=bool)
+        prefixed[self._key_range(term, term + '\uffff')] = True
+        score[prefixed] += 1.0
+        for pos in self._key_range(term, term + '\0'):
+            if self.codes[pos] == term:
+                score[pos] += 2.0
+        matched |= prefixed
+
+        allowed = np.ones(len(self.products), dtype=bool)
+        if wholesaler_id:
+            allowed &= self.wholesaler_ids == wholesaler_id
+        if available_only:
+            allowed &= ~self.unavailable
+
+        # Substrings: any name or code containing the term holds every inner
+        # trigram of its longest word, so only products holding all of them
+        # are checked, best scored first and at most MAX_FUZZY_CANDIDATES
+        word = max(term.split(), key=len)
+        inner, _ = _gram_pairs([word])
+        inner = inner[(inner // len(_ALPHABET) ** 2 != 0) & (inner % len(_ALPHABET) != 0)]
+        if len(inner):
+            candidates = np.flatnonzero(
+                ((self.name_grams.hits(inner) == len(inner)) | (self.code_grams.hits(inner) == len(inner)))
+                & allowed & ~matched)
+            if len(candidates) > MAX_FUZZY_CANDIDATES:
+                candidates = candidates[np.argsort(-score[candidates], kind='stable')[:MAX_FUZZY_CANDIDATES]]
+            for pos in candidates:
+                if term in self.names[pos] or term in self.codes[pos]:
+                    matched[pos] = True
+
+        found = np.flatnonzero(matched & allowed)
+        ranked = found[np.lexsort((self.name_rank[found], -score[found]))][:limit]
+        return [dict(self.products[pos], score=float(score[pos])) for pos in ranked]
+
+def current_catalog_version():
+    """Read the catalog version counter maintained by the product trigger"""
+    version = db.session.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).scalar()
+    return version or 0
+
+def build_catalog_index():
+    """Load the catalog in one query and build a fresh index"""
+    # Read the version first: a write racing the load only makes the index
+    # look older than it is, which triggers another rebuild
+    version = current_catalog_version()
+    rows = db.session.execute(
+        select(Product.id, Product.product_id, Product.name, Product.size,
+               Product.price, Product.wholesaler_id, Product.available_in_store)
+    ).mappings().all()
+    return CatalogIndex(rows, version)
+
+# Per-worker state; each gunicorn worker keeps its own copy of the index
+_lock = threading.Lock()
+_state = {'index': None, 'latest': None, 'checked_at': 0.0, 'building': False}
+
+def _rebuild(app):
+    with app.app_context():
+        try:
+            index = build_catalog_index()
+            _state['index'] = index
+            app.logger.info(f"Catalog index rebuilt: {len(index)} products, version {index.version}")
+        except Exception as e:
+            app.logger.error(f"Error rebuilding catalog index: {str(e)}")
+        finally:
+            db.session.remove()
+            _state['building'] = False
+
+def get_catalog_index():
+    """
+    Return the worker's index if it matches the current catalog version.
+    Returns None while it is missing, stale or rebuilding; callers then use
+    the SQL search path. The version is re-read at most once per
+    CATALOG_VERSION_CHECK_INTERVAL seconds.
+    """
+    if not current_app.config.get('CATALOG_INDEX_ENABLED', True):
+        return None
+
+    now = time.monotonic()
+    if now - _state['checked_at'] >= current_app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 2):
+        try:
+            _state['latest'] = current_catalog_version()
+            _state['checked_at'] = now
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error reading catalog version: {str(e)}")
+            return None
+
+    index = _state['index']
+    if index is not None and index.version == _state['latest']:
+        return index
+
+    with _lock:
+        if not _state['building']:
+            _state['building'] = True
+            threading.Thread(target=_rebuild, args=(current_app._get_current_object(),),
+                             daemon=True).start()
+    return None
+
+def invalidate_catalog_index():
+    """
+    Force the next lookup in this worker to re-read the catalog version.
+    Called after committing product writes, so the worker that made them
+    stops serving the old index at once; other workers notice the version
+    bump on their next poll.
+    """
+    _state['checked_at'] = 0.0
@@ -0,0 +1,285 @@
+# app/utils/column_store.py
+
+import fcntl
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, and_, not_
+
+from app import db
+from app.models import DailySales, OrderList, OrderListItem, ColumnStoreVersion
+
+# Local, append-only copy of closed analytics history. Each table is a
+# directory holding manifest.json and one generation directory of raw
+# little-endian column files (not .npy: its header fixes the length, so it
+# cannot be appended in place). Appends add bytes to the end of each file and
+# then atomically replace the manifest, so readers that memory-map the first
+# `rows` rows never see a partial append and every worker shares the pages
+# through the OS cache. Each append first cuts the files back to the
+# manifest's rows, dropping whatever a crashed append left past them. A
+# rebuild writes a new generation and swaps the manifest; open maps of the
+# old files stay valid until they are dropped.
+
+class StoreTable:
+    """
+    A table of the store: the columns it keeps, the select producing them,
+    and which rows are closed (final) up to a given day
+    """
+    def __init__(self, name, version_key, columns, base, date_column, closed_day, is_closed, order_key):
+        self.name = name
+        self.version_key = version_key
+        self.columns = columns  # [(name, little-endian dtype)]
+        self.base = base
+        self.date_column = date_column
+        self.closed_day = closed_day
+        self.is_closed = is_closed
+        self.order_key = order_key
+
+    @property
+    def names(self):
+        return [name for name, _ in self.columns]
+
+    @property
+    def sorted_by_date(self):
+        # Rows are appended in closed_day order; for sales that is the date
+        return self.closed_day is self.date_column
+
+    def closed_rows(self, after, upto):
+        """Select the rows that closed after the day `after` (exclusive) and up to `upto`"""
+        query = self.base.where(self.is_closed(upto))
+        if after is not None:
+            query = query.where(self.closed_day > after)
+        return query.order_by(self.closed_day, self.order_key)
+
+    def live_rows(self, start_date, end_date, watermark):
+        """Select the rows dated in the range that the store does not hold"""
+        query = self.base.where(self.date_column.between(start_date, end_date))
+        if watermark is not None:
+            query = query.where(not_(self.is_closed(watermark)))
+        return query
+
+# Sales are recorded for the current day, so a day is closed once it is over
+SALES = StoreTable(
+    'sales', 'sales',
+    [('date', '<M8[D]'), ('report_time', '<M8[s]'), ('total_actual', '<f8'),
+     ('overall_discrepancy', '<f8'), ('cash', '<f8'), ('card', '<f8'), ('otc', '<f8')],
+    select(
+        DailySales.date,
+        DailySales.report_time,
+        DailySales.total_actual,
+        DailySales.overall_discrepancy,
+        DailySales.front_register_cash + DailySales.back_register_cash,
+        DailySales.credit_card_total,
+        DailySales.otc1_total + DailySales.otc2_total
+    ),
+    DailySales.date,
+    DailySales.date,
+    lambda upto: DailySales.date <= upto,
+    DailySales.id
+)
+
+# Order lists close on the day they are finalized (their own date when that
+# was not recorded); pending lists always stay live
+_list_closed_day = func.coalesce(func.date(OrderList.finalized_date), OrderList.date)
+
+def _list_is_closed(upto):
+    return and_(func.coalesce(OrderList.status, 'pending') == 'finalized', _list_closed_day <= upto)
+
+ORDERS = StoreTable(
+    'orders', 'orders',
+    [('date', '<M8[D]'), ('wholesaler_id', '<i8'), ('total_value', '<f8'), ('pending', '|b1')],
+    select(
+        OrderList.date,
+        OrderList.wholesaler_id,
+        OrderList.total_value,
+        func.coalesce(OrderList.status, 'pending') == 'pending'
+    ),
+    OrderList.date,
+    _list_closed_day,
+    _list_is_closed,
+    OrderList.id
+)
+
+ORDER_LINES = StoreTable(
+    'order_lines', 'orders',
+    [('date', '<M8[D]'), ('product_id', '<i8'), ('quantity', '<i8'), ('value', '<f8')],
+    select(
+        OrderList.date,
+        OrderListItem.product_id,
+        OrderListItem.quantity,
+        OrderListItem.quantity * func.coalesce(OrderListItem.price, 0)
+    ).join(OrderList, OrderListItem.order_list_id == OrderList.id),
+    OrderList.date,
+    _list_closed_day,
+    _list_is_closed,
+    OrderListItem.id
+)
+
+STORE_TABLES = (SALES, ORDERS, ORDER_LINES)
+
+# Per worker: table name -> (generation, rows, {column: memmap})
+_mapped = {}
+
+def to_columns(table, rows):
+    """Turn the rows of one of the table's selects into a dict of NumPy arrays"""
+    columns = zip(*rows) if rows else [()] * len(table.columns)
+    return {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(table.columns, columns)}
+
+def _root():
+    return current_app.config.get('COLUMN_STORE_PATH') or os.path.join(current_app.instance_path, 'column_store')
+
+def _table_dir(table):
+    return os.path.join(_root(), table.name)
+
+def _read_manifest(table):
+    try:
+        with open(os.path.join(_table_dir(table), 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(table, manifest):
+    path = os.path.join(_table_dir(table), 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def _append_files(table, generation, columns):
+    directory = os.path.join(_table_dir(table), generation)
+    os.makedirs(directory, exist_ok=True)
+    for name, dtype in table.columns:
+        with open(os.path.join(directory, f'{name}.bin'), 'ab') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+def _truncate_files(table, manifest):
+    """
+    Cut the column files back to the rows the manifest covers. Returns
+    False if a file holds fewer rows, in which case the table is rebuilt.
+    """
+    directory = os.path.join(_table_dir(table), manifest['generation'])
+    for name, dtype in table.columns:
+        path = os.path.join(directory, f'{name}.bin')
+        size = manifest['rows'] * np.dtype(dtype).itemsize
+        try:
+            if os.path.getsize(path) < size:
+                return False
+            os.truncate(path, size)
+        except FileNotFoundError:
+            return False
+    return True
+
+def current_store_version(table):
+    """Read the version counter the history triggers bump for this table"""
+    version = db.session.execute(
+        select(ColumnStoreVersion.version).where(ColumnStoreVersion.name == table.version_key)
+    ).scalar()
+    return version or 0
+
+def closed_watermark():
+    """Last day whose rows are final: yesterday, in UTC like the recorded dates"""
+    return datetime.utcnow().date() - timedelta(days=1)
+
+def update_table(table, blocking=False):
+    """
+    Bring one table up to date: append the days closed since its watermark,
+    or rebuild it when history it holds was changed. Returns the manifest,
+    or None if another process holds the lock and blocking is False.
+    """
+    os.makedirs(_table_dir(table), exist_ok=True)
+    with open(os.path.join(_table_dir(table), 'lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return None
+
+        manifest = _read_manifest(table)
+        # Read the version first: an edit racing the load leaves it behind,
+        # so the next check rebuilds again instead of keeping stale rows
+        version = current_store_version(table)
+        watermark = closed_watermark()
+
+        if manifest is not None and manifest['version'] == version and manifest['watermark'] >= watermark.isoformat():
+            return manifest
+
+        if manifest is None or manifest['version'] != version or not _truncate_files(table, manifest):
+            generation = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+            columns = to_columns(table, db.session.execute(table.closed_rows(None, watermark)).all())
+            _append_files(table, generation, columns)
+            manifest = {'version': version, 'generation': generation, 'rows': 0, 'watermark': None}
+        else:
+            after = datetime.strptime(manifest['watermark'], '%Y-%m-%d').date()
+            columns = to_columns(table, db.session.execute(table.closed_rows(after, watermark)).all())
+            _append_files(table, manifest['generation'], columns)
+
+        manifest['rows'] += len(columns[table.columns[0][0]])
+        manifest['watermark'] = watermark.isoformat()
+        _write_manifest(table, manifest)
+
+        # Drop replaced generations; workers still mapping them keep the inodes
+        for entry in os.listdir(_table_dir(table)):
+            path = os.path.join(_table_dir(table), entry)
+            if os.path.isdir(path) and entry != manifest['generation']:
+                shutil.rmtree(path, ignore_errors=True)
+        return manifest
+
+def _map(table, manifest):
+    generation, rows = manifest['generation'], manifest['rows']
+    cached = _mapped.get(table.name)
+    if cached and cached[0] == generation and cached[1] == rows:
+        return cached[2]
+    directory = os.path.join(_table_dir(table), generation)
+    arrays = {
+        name: np.memmap(os.path.join(directory, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+        if rows else np.empty(0, dtype=dtype)
+        for name, dtype in table.columns
+    }
+    _mapped[table.name] = (generation, rows, arrays)
+    return arrays
+
+def _stored(table, start_date, end_date):
+    """
+    Stored columns of the rows dated in the range and the watermark they
+    cover, or (None, None) when there is no store or history it holds was
+    edited. Requests never update the store: days closed since its
+    watermark are read live until update-column-store appends them.
+    """
+    if not current_app.config.get('COLUMN_STORE_ENABLED', True):
+        return None, None
+    try:
+        manifest = _read_manifest(table)
+        if manifest is None or manifest['version'] != current_store_version(table):
+            return None, None
+        arrays = _map(table, manifest)
+    except Exception as e:
+        current_app.logger.error(f"Error opening column store table {table.name}: {str(e)}")
+        return None, None
+
+    start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+    dates = arrays['date']
+    if table.sorted_by_date:
+        # Zero-copy views of the mapped files
+        lo, hi = np.searchsorted(dates, start, 'left'), np.searchsorted(dates, end, 'right')
+        selected = {name: values[lo:hi] for name, values in arrays.items()}
+    else:
+        mask = (dates >= start) & (dates <= end)
+        selected = {name: values[mask] for name, values in arrays.items()}
+    return selected, datetime.strptime(manifest['watermark'], '%Y-%m-%d').date()
+
+def read_columns(table, start_date, end_date):
+    """
+    Columns of every row of table dated in the range: closed history from
+    the mapped store, the rest (open days, pending lists) read live
+    """
+    stored, watermark = _stored(table, start_date, end_date)
+    live = to_columns(table, db.session.execute(table.live_rows(start_date, end_date, watermark)).all())
+    if stored is None:
+        return live
+    return {name: np.concatenate([stored[name], live[name]]) for name in table.names}
@@ -0,0 +1,59 @@
+# app/utils/downsample.py
+
+import numpy as np
+
+def lttb_indices(values, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps when reducing
+    evenly spaced values to threshold points. The first and last points are
+    always kept; between them each bucket keeps the point forming the largest
+    triangle with the previous pick and the next bucket's average, which
+    preserves peaks and dips.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])[:max(threshold, 1)]
+
+    every = (n - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0] = a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(max(int((i + 2) * every) + 1, end + 1), n)
+        avg_x = (end + next_end - 1) / 2
+        avg_y = values[end:next_end].mean()
+
+        xs = np.arange(start, end)
+        area = np.abs((a - avg_x) * (values[start:end] - values[a]) - (a - xs) * (avg_y - values[a]))
+        a = start + int(area.argmax())
+        picked[i + 1] = a
+    picked[-1] = n - 1
+    return picked
+
+def downsample_trend(trend, points):
+    """
+    Reduce a get_trend_data() result to at most about points labels. Each
+    series gets an equal share of the budget for LTTB over its totals, and
+    the union of the kept indices is applied to the labels and every array,
+    so the series stay parallel.
+    """
+    size = len(trend['labels'])
+    if points is None or size <= points:
+        return trend
+
+    budget = max(points // max(len(trend['series']), 1), 3)
+    keep = np.unique(np.concatenate([
+        lttb_indices(data['totals'], budget) for data in trend['series'].values()
+    ] or [np.arange(min(points, size))]))
+
+    return {
+        'labels': [trend['labels'][i] for i in keep],
+        'series': {
+            name: {key: [values[i] for i in keep] for key, values in data.items()}
+            for name, data in trend['series'].items()
+        }
+    }
@@ -0,0 +1,414 @@
+# app/utils/order_lists.py
+
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import Product, Wholesaler, OrderList, OrderListItem
+from app import db
+
+MAX_SCAN_BATCH = 500
+MAX_OPERATIONS = 1000
+
+def list_type_for(is_daily):
+    """Order list type a wholesaler's products go on"""
+    return 'daily' if is_daily else 'monthly'
+
+def pending_list_ids(keys):
+    """Map (wholesaler_id, type) -> id of its pending OrderList, in one query"""
+    wholesaler_ids = {wholesaler_id for wholesaler_id, _ in keys}
+    if not wholesaler_ids:
+        return {}
+    rows = db.session.execute(
+        select(OrderList.wholesaler_id, OrderList.type, func.min(OrderList.id))
+        .where(OrderList.status == 'pending',
+               OrderList.wholesaler_id.in_(wholesaler_ids))
+        .group_by(OrderList.wholesaler_id, OrderList.type)
+    ).all()
+    return {(w, t): list_id for w, t, list_id in rows if (w, t) in keys}
+
+# Per-worker cache (wholesaler_id, type) -> pending OrderList id. Entries are
+# checked against the database as part of add_to_pending_lists(), so a list
+# finalized or deleted by another worker, the scheduler or a CLI command is
+# noticed and re-resolved; no cross-process invalidation is needed.
+_pending_lists = {}
+
+def forget_pending_lists(list_type=None, wholesaler_ids=None):
+    """
+    Drop this process's cached pending list ids after it finalized lists,
+    saving the re-resolve on its next add. Other processes are unaffected.
+    """
+    for key in list(_pending_lists):
+        if list_type is not None and key[1] != list_type:
+            continue
+        if wholesaler_ids is not None and key[0] not in wholesaler_ids:
+            continue
+        _pending_lists.pop(key, None)
+
+def resolve_pending_lists(keys, use_cache=True, day=None):
+    """
+    Map (wholesaler_id, type) -> id of its pending OrderList, opening the
+    missing ones dated day (default today). Uncached keys are resolved with
+    a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING against the
+    partial unique index uq_order_list_pending, so concurrent callers always
+    agree on one list and no SELECT round trip is needed. Does not commit.
+    """
+    list_ids = {key: _pending_lists[key] for key in keys if use_cache and key in _pending_lists}
+    missing = [key for key in keys if key not in list_ids]
+    if missing:
+        day = day or datetime.utcnow().date()
+        stmt = pg_insert(OrderList).values([
+            {'wholesaler_id': wholesaler_id, 'type': list_type, 'status': 'pending', 'date': day}
+            for wholesaler_id, list_type in missing
+        ])
+        # A no-op DO UPDATE (rather than DO NOTHING) makes RETURNING include existing rows
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OrderList.wholesaler_id, OrderList.type],
+            index_where=text("status = 'pending'"),
+            set_={'status': stmt.excluded.status}
+        ).returning(OrderList.wholesaler_id, OrderList.type, OrderList.id)
+        for wholesaler_id, list_type, list_id in db.session.execute(stmt):
+            list_ids[(wholesaler_id, list_type)] = list_id
+        _pending_lists.update({key: list_ids[key] for key in missing})
+    return list_ids
+
+def _still_pending(list_ids):
+    """
+    The ids among list_ids whose lists are still pending, in one query. The
+    rows are locked FOR UPDATE, in id order, so a finalize cannot commit
+    between this check and the line insert; one that is already running
+    is waited for, and its lists then fail the status check.
+    """
+    return set(db.session.scalars(
+        select(OrderList.id)
+        .where(OrderList.id.in_(list_ids), OrderList.status == 'pending')
+        .order_by(OrderList.id)
+        .with_for_update()
+    ))
+
+def add_to_pending_lists(lines):
+    """
+    Add lines (dicts with key=(wholesaler_id, type), product_id, quantity and
+    optional comment) to the pending order lists, opening missing lists.
+    A product already on its list has its quantity increased instead of
+    getting a second line, and repeated lines are summed. The merge is one
+    INSERT ... ON CONFLICT DO UPDATE against uq_order_list_item_product that
+    adds to the stored quantity, so concurrent adds neither lose increments
+    nor create duplicate lines. Does not commit.
+    Returns ({'inserted': n, 'merged': n}, {key: list id}).
+    """
+    merged = OrderedDict()
+    for line in lines:
+        key = (line['key'], line['product_id'])
+        if key in merged:
+            merged[key]['quantity'] += line['quantity']
+            merged[key]['comment'] = line.get('comment') or merged[key]['comment']
+        else:
+            merged[key] = {'quantity': line['quantity'], 'comment': line.get('comment')}
+    if not merged:
+        return {'inserted': 0, 'merged': 0}, {}
+
+    keys = {key for key, _ in merged}
+    list_ids = resolve_pending_lists(keys)
+    pending = _still_pending(set(list_ids.values()))
+    stale = {key for key, list_id in list_ids.items() if list_id not in pending}
+    if stale:
+        # Cached ids of lists finalized or deleted elsewhere; resolve those afresh
+        for key in stale:
+            _pending_lists.pop(key, None)
+        list_ids.update(resolve_pending_lists(stale, use_cache=False))
+
+    values = [
+        {'order_list_id': list_ids[key], 'product_id': product_id,
+         'quantity': line['quantity'], 'comment': line['comment']}
+        for (key, product_id), line in merged.items()
+    ]
+    stmt = pg_insert(OrderListItem).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OrderListItem.order_list_id, OrderListItem.product_id],
+        set_={
+            'quantity': OrderListItem.quantity + stmt.excluded.quantity,
+            'comment': func.coalesce(stmt.excluded.comment, OrderListItem.comment)
+        }
+    ).returning(OrderListItem.order_list_id, OrderListItem.product_id, OrderListItem.quantity)
+
+    # A merged line comes back with more than the quantity that was sent
+    sent = {(value['order_list_id'], value['product_id']): value['quantity'] for value in values}
+    merged_count = sum(
+        quantity > sent[(list_id, product_id)]
+        for list_id, product_id, quantity in db.session.execute(stmt)
+    )
+    return {'inserted': len(values) - merged_count, 'merged': merged_count}, list_ids
+
+def _positive_int(value, field, index):
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f'Operation {index}: {field} must be a positive integer')
+    return value
+
+def apply_order_list_operations(operations):
+    """
+    Apply a batch of order-list edits in the caller's transaction.
+    Each operation is one of
+        {'op': 'add', 'product_id': id, 'quantity': n, 'order_type': optional, 'comment': optional}
+        {'op': 'update', 'item_id': id, 'quantity': optional, 'comment': optional}
+        {'op': 'remove', 'item_id': id}
+    Removes run first, then updates, then adds. Adds of a product that is
+    already on its pending list, or repeated in the batch, are merged into
+    one line with the quantities summed. Adds go to the pending list of the
+    product's wholesaler, opening it if needed. Invalid operations raise
+    ValueError before anything is written. Does not commit.
+    """
+    if not isinstance(operations, list):
+        raise ValueError('operations must be a list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f'At most {MAX_OPERATIONS} operations can be applied in one batch')
+
+    adds, updates, removes = [], {}, set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f'Operation {index}: must be an object')
+        op = operation.get('op')
+        if op == 'add':
+            order_type = operation.get('order_type')
+            if order_type not in (None, 'daily', 'monthly'):
+                raise ValueError(f"Operation {index}: order_type must be 'daily' or 'monthly'")
+            adds.append({
+                'product_id': _positive_int(operation.get('product_id'), 'product_id', index),
+                'quantity': _positive_int(operation.get('quantity'), 'quantity', index),
+                'order_type': order_type,
+                'comment': operation.get('comment')
+            })
+        elif op == 'update':
+            item_id = _positive_int(operation.get('item_id'), 'item_id', index)
+            change = updates.setdefault(item_id, {})
+            if 'quantity' in operation:
+                change['quantity'] = _positive_int(operation['quantity'], 'quantity', index)
+            if 'comment' in operation:
+                change['comment'] = operation['comment']
+            if not change:
+                raise ValueError(f'Operation {index}: nothing to update')
+        elif op == 'remove':
+            removes.add(_positive_int(operation.get('item_id'), 'item_id', index))
+        else:
+            raise ValueError(f"Operation {index}: op must be 'add', 'update' or 'remove'")
+
+    # Updates and removes only touch lines of pending lists
+    item_ids = removes | set(updates)
+    current = {}
+    if item_ids:
+        current = {item_id: quantity for item_id, quantity in db.session.execute(
+            select(OrderListItem.id, OrderListItem.quantity)
+            .join(OrderList, OrderListItem.order_list_id == OrderList.id)
+            .where(OrderListItem.id.in_(item_ids), OrderList.status == 'pending')
+        )}
+    missing_items = sorted(item_ids - set(current))
+
+    removed = sorted(removes & set(current))
+    if removed:
+        db.session.execute(delete(OrderListItem).where(OrderListItem.id.in_(removed)))
+
+    changes = [dict(change, id=item_id) for item_id, change in updates.items()
+               if item_id in current and item_id not in removes]
+    for columns in {frozenset(change) for change in changes}:
+        db.session.execute(update(OrderListItem),
+                           [change for change in changes if frozenset(change) == columns])
+
+    result = {'removed': len(removed), 'updated': len(changes), 'inserted': 0, 'merged': 0,
+              'missing_items': missing_items, 'missing_products': []}
+    if not adds:
+        return result
+
+    products = {row.id: row for row in db.session.execute(
+        select(Product.id, Product.wholesaler_id, Wholesaler.is_daily)
+        .join(Wholesaler, Product.wholesaler_id == Wholesaler.id)
+        .where(Product.id.in_({add['product_id'] for add in adds}))
+    )}
+    result['missing_products'] = sorted({add['product_id'] for add in adds} - set(products))
+
+    lines = []
+    for add in adds:
+        product = products.get(add['product_id'])
+        if product is not None:
+            lines.append(dict(add, key=(product.wholesaler_id,
+                                        add['order_type'] or list_type_for(product.is_daily))))
+    counts, _ = add_to_pending_lists(lines)
+    result.update(counts)
+    return result
+
+def lookup_scanned_codes(codes):
+    """
+    Resolve scanned product codes with one indexed IN query.
+    Returns an OrderedDict code -> row (or None when unknown), in scan order.
+    """
+    distinct = list(OrderedDict.fromkeys(codes))
+    rows = db.session.execute(
+        select(Product.id, Product.product_id, Product.name, Product.size, Product.price,
+               Product.available_in_store, Wholesaler.id.label('wholesaler_id'),
+               Wholesaler.name.label('wholesaler_name'), Wholesaler.is_daily)
+        .join(Wholesaler, Product.wholesaler_id == Wholesaler.id)
+        .where(Product.product_id.in_(distinct))
+    ).mappings().all()
+    found = {row['product_id']: row for row in rows}
+    return OrderedDict((code, found.get(code)) for code in distinct)
+
+def process_scans(codes, add=False):
+    """
+    Resolve a batch of scanned codes and optionally add them to the right
+    pending order lists in the same transaction. Scanning a code several
+    times adds up its quantity. Does not commit.
+    """
+    codes = [str(code).strip() for code in codes if str(code).strip()]
+    if len(codes) > MAX_SCAN_BATCH:
+        raise ValueError(f'At most {MAX_SCAN_BATCH} codes can be scanned in one batch')
+
+    quantities = Counter(codes)
+    matches = lookup_scanned_codes(codes)
+    keys = {(row['wholesaler_id'], list_type_for(row['is_daily']))
+            for row in matches.values() if row}
+
+    added = 0
+    if add and keys:
+        lines = [{
+            'key': (row['wholesaler_id'], list_type_for(row['is_daily'])),
+            'product_id': row['id'],
+            'quantity': quantities[code]
+        } for code, row in matches.items() if row]
+        _, list_ids = add_to_pending_lists(lines)
+        added = len(lines)
+    else:
+        list_ids = pending_list_ids(keys)
+
+    results = []
+    for code, row in matches.items():
+        if row is None:
+            results.append({'code': code, 'found': False, 'quantity': quantities[code]})
+            continue
+        list_type = list_type_for(row['is_daily'])
+        results.append({
+            'code': code,
+            'found': True,
+            'quantity': quantities[code],
+            'product': {
+                'id': row['id'],
+                'product_id': row['product_id'],
+                'name': row['name'],
+                'size': row['size'],
+                'price': row['price'],
+                'available_in_store': row['available_in_store']
+            },
+            'wholesaler': {
+                'id': row['wholesaler_id'],
+                'name': row['wholesaler_name'],
+                'is_daily': row['is_daily']
+            },
+            'order_type': list_type,
+            'order_list_id': list_ids.get((row['wholesaler_id'], list_type))
+        })
+
+    return {
+        'results': results,
+        'not_found': [r['code'] for r in results if not r['found']],
+        'added': added
+    }
+
+def finalize_pending_lists(list_types, wholesaler_ids=None):
+    """
+    Finalize the pending lists of the given types, optionally only for some
+    wholesalers, with a single UPDATE ... RETURNING that also reports each
+    list's stored line count and total value. Does not commit.
+    """
+    wholesaler_name = (
+        select(Wholesaler.name)
+        .where(Wholesaler.id == OrderList.wholesaler_id)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(OrderList)
+        .where(OrderList.status == 'pending', OrderList.type.in_(list_types))
+        .values(status='finalized', finalized_date=datetime.utcnow())
+        .returning(OrderList.id, OrderList.type, OrderList.wholesaler_id,
+                   wholesaler_name, OrderList.item_count, OrderList.total_value)
+    )
+    if wholesaler_ids is not None:
+        stmt = stmt.where(OrderList.wholesaler_id.in_(wholesaler_ids))
+    rows = db.session.execute(stmt, execution_options={'synchronize_session': False}).all()
+
+    wholesalers = OrderedDict()
+    for list_id, list_type, wholesaler_id, name, lines, total in sorted(rows, key=lambda r: (r[3], r[0])):
+        summary = wholesalers.setdefault(wholesaler_id, {
+            'wholesaler_id': wholesaler_id,
+            'wholesaler_name': name,
+            'order_list_ids': [],
+            'line_count': 0,
+            'total_value': 0.0
+        })
+        summary['order_list_ids'].append(list_id)
+        summary['line_count'] += lines
+        summary['total_value'] += float(total or 0)
+
+    for summary in wholesalers.values():
+        summary['total_value'] = round(summary['total_value'], 2)
+    for list_type in list_types:
+        forget_pending_lists(list_type, set(wholesalers))
+    return {
+        'finalized': len(rows),
+        'line_count': sum(s['line_count'] for s in wholesalers.values()),
+        'total_value': round(sum(s['total_value'] for s in wholesalers.values()), 2),
+        'wholesalers': list(wholesalers.values())
+    }
+
+def _pending_order_rows(list_types):
+    """
+    Every pending list of the given types with its lines, in one joined
+    query that reads only the columns the JSON endpoints return.
+    Lists without lines come back once with NULL item columns.
+    """
+    return db.session.execute(
+        select(OrderList.id.label('order_id'), OrderList.type,
+               Wholesaler.name.label('wholesaler_name'),
+               OrderListItem.id.label('item_id'), OrderListItem.quantity,
+               OrderListItem.comment, Product.name.label('product_name'))
+        .join(Wholesaler, OrderList.wholesaler_id == Wholesaler.id)
+        .outerjoin(OrderListItem, OrderListItem.order_list_id == OrderList.id)
+        .outerjoin(Product, OrderListItem.product_id == Product.id)
+        .where(OrderList.status == 'pending', OrderList.type.in_(list_types))
+        .order_by(Wholesaler.name, OrderList.id, OrderListItem.id)
+    ).mappings().all()
+
+def pending_items_by_wholesaler(list_type):
+    """Pending lines of one list type keyed by wholesaler name"""
+    orders = {}
+    for row in _pending_order_rows([list_type]):
+        items = orders.setdefault(row['wholesaler_name'], [])
+        if row['item_id'] is not None:
+            items.append({
+                'id': row['item_id'],
+                'product_name': row['product_name'],
+                'quantity': row['quantity']
+            })
+    return orders
+
+def pending_order_lists():
+    """Pending daily and monthly lists with their lines"""
+    lists = OrderedDict()
+    for row in _pending_order_rows(['daily', 'monthly']):
+        order = lists.setdefault(row['order_id'], {
+            'type': row['type'],
+            'id': row['order_id'],
+            'wholesaler_name': row['wholesaler_name'],
+            'items': []
+        })
+        if row['item_id'] is not None:
+            order['items'].append({
+                'product_name': row['product_name'],
+                'quantity': row['quantity'],
+                'comment': row['comment']
+            })
+
+    grouped = {'daily': [], 'monthly': []}
+    for order in lists.values():
+        grouped[order.pop('type')].append(order)
+    return grouped
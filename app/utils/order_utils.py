@@ -1,16 +1,53 @@
 # app/utils/order_utils.py
-from app import db
-from app.models import Wholesaler, Order
 from datetime import datetime
 
-def generate_daily_orders():
-    today = datetime.utcnow().date()
-    daily_wholesalers = Wholesaler.query.filter_by(is_daily=True).all()
-    
-    for wholesaler in daily_wholesalers:
-        existing_order = Order.query.filter_by(wholesaler=wholesaler, date=today).first()
-        if not existing_order:
-            new_order = Order(wholesaler=wholesaler, date=today)
-            db.session.add(new_order)
-    
-    db.session.commit()
\ No newline at end of file
+from sqlalchemy import select, insert, exists, literal, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models import Wholesaler, OrderList, OrderListItem, StandingOrderItem
+
+def generate_daily_lists(prefill=False, day=None):
+    """
+    Open a pending daily list for every daily wholesaler that has none, in
+    one INSERT ... SELECT ... WHERE NOT EXISTS. With prefill, the new lists
+    get the wholesaler's standing order lines in one more INSERT ... SELECT.
+    Lists that already existed are left untouched. Does not commit.
+    """
+    day = day or datetime.utcnow().date()
+    missing = select(
+        Wholesaler.id, literal('daily'), literal('pending'), literal(day)
+    ).where(
+        Wholesaler.is_daily.is_(True),
+        ~exists().where(OrderList.wholesaler_id == Wholesaler.id,
+                        OrderList.type == 'daily',
+                        OrderList.status == 'pending')
+    )
+    # ON CONFLICT covers a list opened by an employee between the check and the insert
+    stmt = pg_insert(OrderList).from_select(
+        ['wholesaler_id', 'type', 'status', 'date'], missing
+    ).on_conflict_do_nothing(
+        index_elements=[OrderList.wholesaler_id, OrderList.type],
+        index_where=text("status = 'pending'")
+    ).returning(OrderList.id)
+    created = [list_id for list_id, in db.session.execute(stmt)]
+
+    # Web workers need no signal: new lists only fill keys that had no
+    # pending list, and add_to_pending_lists() re-checks cached ids anyway
+    prefilled = prefill_from_standing_orders(created) if prefill else 0
+    return {'created': len(created), 'prefilled_items': prefilled}
+
+def prefill_from_standing_orders(list_ids):
+    """
+    Copy each wholesaler's standing order onto the given (new, empty) lists
+    in one INSERT ... SELECT. Does not commit. Returns the lines added.
+    """
+    if not list_ids:
+        return 0
+    result = db.session.execute(insert(OrderListItem).from_select(
+        ['order_list_id', 'product_id', 'quantity', 'comment'],
+        select(OrderList.id, StandingOrderItem.product_id,
+               StandingOrderItem.quantity, StandingOrderItem.comment)
+        .join(StandingOrderItem, StandingOrderItem.wholesaler_id == OrderList.wholesaler_id)
+        .where(OrderList.id.in_(list_ids))
+    ))
+    return result.rowcount
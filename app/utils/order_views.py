@@ -0,0 +1,85 @@
+# app/utils/order_views.py
+
+from sqlalchemy import MetaData, Table, Column, Date, Integer, Float, select, func, text
+
+from app import db
+from app.models import OrderList, Product
+
+# Materialized views created by migration 2b8d5e0c7a14. They live in their
+# own MetaData so db.create_all() never creates tables in their place.
+views = MetaData()
+
+order_daily_totals = Table(
+    'order_daily_totals', views,
+    Column('date', Date),
+    Column('wholesaler_id', Integer),
+    Column('list_count', Integer),
+    Column('line_count', Integer),
+    Column('total_value', Float)
+)
+
+order_product_daily = Table(
+    'order_product_daily', views,
+    Column('date', Date),
+    Column('wholesaler_id', Integer),
+    Column('product_id', Integer),
+    Column('quantity', Integer),
+    Column('total_value', Float)
+)
+
+ORDER_VIEWS = (order_daily_totals, order_product_daily)
+
+def refresh_order_views(concurrently=True):
+    """
+    Rebuild the order analytics views. CONCURRENTLY lets analytics keep
+    reading the old contents meanwhile; it needs the views populated
+    once already, which the migration does. Does not commit.
+    """
+    option = 'CONCURRENTLY ' if concurrently else ''
+    for view in ORDER_VIEWS:
+        db.session.execute(text(f'REFRESH MATERIALIZED VIEW {option}{view.name}'))
+
+def order_weekday_totals(start_date, end_date):
+    """
+    Lists and value per ISO weekday (1 = Monday) in the range. Every row
+    also carries the range totals, computed by window functions over the
+    grouped rows, so the summary needs no second query.
+    """
+    v = order_daily_totals
+    weekday = func.extract('isodow', v.c.date)
+    list_count = func.sum(v.c.list_count)
+    total_value = func.sum(v.c.total_value)
+    query = select(
+        weekday.label('weekday'),
+        list_count.label('list_count'),
+        total_value.label('total_value'),
+        func.sum(list_count).over().label('all_lists'),
+        func.sum(total_value).over().label('all_value')
+    ).where(
+        v.c.date.between(start_date, end_date)
+    ).group_by(weekday).order_by(weekday)
+    return db.session.execute(query).all()
+
+def top_ordered_products(start_date, end_date, limit=5):
+    """Products with the highest ordered value in the range, with quantity and value"""
+    v = order_product_daily
+    totals = select(
+        v.c.product_id,
+        func.sum(v.c.quantity).label('quantity'),
+        func.sum(v.c.total_value).label('total_value')
+    ).where(
+        v.c.date.between(start_date, end_date)
+    ).group_by(v.c.product_id).order_by(func.sum(v.c.total_value).desc()).limit(limit).subquery()
+    query = select(
+        Product.name, totals.c.quantity, totals.c.total_value
+    ).join(Product, Product.id == totals.c.product_id).order_by(totals.c.total_value.desc())
+    return db.session.execute(query).all()
+
+def pending_list_count(start_date, end_date):
+    """Pending lists in the range, read live since the views lag behind finalizing"""
+    return db.session.scalar(
+        select(func.count()).select_from(OrderList).where(
+            OrderList.status == 'pending',
+            OrderList.date.between(start_date, end_date)
+        )
+    )
@@ -0,0 +1,84 @@
+# app/utils/pagination.py
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import tuple_, func
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _load(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+def encode_cursor(values):
+    """Encode the sort key of a row as an opaque URL-safe cursor"""
+    raw = json.dumps([_dump(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    """Decode a cursor from encode_cursor(); returns None for a missing or malformed one"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = [_load(v) for v in json.loads(raw)]
+    except (ValueError, TypeError):
+        return None
+    return values if len(values) == size else None
+
+def keyset_paginate(query, columns, key, per_page, after=None, before=None, descending=False):
+    """
+    Fetch one page of an ORM query with keyset (seek) pagination.
+    columns are the sort columns, ending with a unique one such as the id,
+    and key(item) returns the matching values of a loaded row. Only
+    per_page + 1 rows are read, so cost does not grow with page depth.
+    """
+    after = decode_cursor(after, len(columns))
+    before = decode_cursor(before, len(columns)) if after is None else None
+    sort_key = tuple_(*columns)
+
+    if after is not None:
+        query = query.filter(sort_key < tuple_(*after) if descending else sort_key > tuple_(*after))
+    if before is not None:
+        query = query.filter(sort_key > tuple_(*before) if descending else sort_key < tuple_(*before))
+
+    # Walking backwards reads the page in reverse order and flips it afterwards
+    reverse = descending != (before is not None)
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in columns])
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if before is not None:
+        items.reverse()
+
+    has_next = has_more if before is None else True
+    has_prev = after is not None if before is None else has_more
+    return {
+        'items': items,
+        'per_page': per_page,
+        'has_next': has_next and bool(items),
+        'has_prev': has_prev and bool(items),
+        'next_cursor': encode_cursor(key(items[-1])) if has_next and items else None,
+        'prev_cursor': encode_cursor(key(items[0])) if has_prev and items else None
+    }
+
+def capped_count(query, cap):
+    """
+    Count the rows of an ORM query, stopping at cap. Returns (count, exact);
+    exact is False when there are more than cap rows. Bounds the cost of
+    "N results" on large tables where a full COUNT(*) would scan everything.
+    """
+    limited = query.order_by(None).limit(cap + 1).subquery()
+    count = query.session.query(func.count()).select_from(limited).scalar()
+    return min(count, cap), count <= cap
@@ -0,0 +1,484 @@
+# app/utils/product_import.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from openpyxl import load_workbook
+from sqlalchemy import select, update, insert, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import Product, Wholesaler, ProductPriceHistory
+from app import db
+
+REQUIRED_COLUMNS = ['product_id', 'name', 'size', 'price', 'wholesaler_id']
+UPSERT_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+MAX_ARCHIVE_SIZE = 256 * 1024 * 1024  # uncompressed bytes accepted from one ZIP
+
+# Columns refreshed when a product_id already exists in the catalog
+UPDATABLE_COLUMNS = ['name', 'size', 'price', 'wholesaler_id']
+
+def _as_text(series):
+    """Convert a column to stripped strings, keeping integer-like numbers intact"""
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values % 1 == 0).all():
+            series = series.astype('Int64')
+    return series.astype('string').str.strip()
+
+def _add_errors(errors, mask, message):
+    """Record a message for every row selected by the mask"""
+    mask = mask.fillna(False).astype(bool)
+    for row in mask[mask].index:
+        errors.setdefault(row, []).append(message)
+
+def check_product_frame(df, first_row=2):
+    """
+    Run the checks that need no database access.
+    Returns (clean, errors): clean is a typed DataFrame of the rows that
+    passed, with a 'row' column holding the spreadsheet row number, and
+    errors is a list of {'row', 'product_id', 'error'} dicts.
+    first_row is the spreadsheet row number of the first data row.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError("Excel file must contain columns: " + ", ".join(REQUIRED_COLUMNS))
+
+    df = df.reset_index(drop=True)
+    # Rows with no values at all (spacer or trailing formatted rows) are skipped silently
+    blank = df[REQUIRED_COLUMNS].isna().all(axis=1)
+    product_id = _as_text(df['product_id'])
+    name = _as_text(df['name'])
+    size = _as_text(df['size'])
+    price = pd.to_numeric(df['price'], errors='coerce')
+    wholesaler_id = pd.to_numeric(df['wholesaler_id'], errors='coerce')
+
+    errors = {}
+    _add_errors(errors, product_id.fillna('') == '', 'Missing product_id')
+    _add_errors(errors, product_id.str.len().fillna(0) > 20, 'product_id is longer than 20 characters')
+    _add_errors(errors, name.fillna('') == '', 'Missing name')
+    _add_errors(errors, name.str.len().fillna(0) > 100, 'Name is longer than 100 characters')
+    _add_errors(errors, size.str.len().fillna(0) > 50, 'Size is longer than 50 characters')
+    _add_errors(errors, price.isna() | (price < 0), 'Price must be a non-negative number')
+    _add_errors(errors, wholesaler_id.isna() | (wholesaler_id % 1 != 0),
+                'wholesaler_id must be a whole number')
+
+    for row in blank[blank].index:
+        errors.pop(row, None)
+
+    valid = ~blank & ~df.index.isin(list(errors))
+    clean = pd.DataFrame({
+        'row': df.index[valid] + first_row,
+        'product_id': product_id[valid].astype(object),
+        'name': name[valid].astype(object),
+        'size': size[valid].astype(object),
+        'price': price[valid].astype(float),
+        'wholesaler_id': wholesaler_id[valid].astype(int),
+    })
+    clean['size'] = clean['size'].where(clean['size'].fillna('') != '', None)
+
+    error_list = [{
+        'row': int(row) + first_row,
+        'product_id': None if pd.isna(product_id[row]) else str(product_id[row]),
+        'error': '; '.join(messages)
+    } for row, messages in sorted(errors.items())]
+
+    return clean, error_list
+
+def _frame_errors(frame, message):
+    """Build error dicts for every row of a clean frame"""
+    extra = ['sheet'] if 'sheet' in frame.columns else []
+    return [dict({
+        'row': int(row['row']),
+        'product_id': row['product_id'],
+        'error': message
+    }, **{key: row[key] for key in extra}) for row in frame.to_dict('records')]
+
+def resolve_product_frame(clean, errors):
+    """
+    Finish validation of check_product_frame() output against the database.
+    Every referenced wholesaler is resolved with a single IN query.
+    Returns (records, errors) where records are ready for upsert_products().
+    """
+    errors = list(errors)
+
+    requested_ids = {int(w) for w in clean['wholesaler_id'].unique()}
+    known_ids = set()
+    if requested_ids:
+        known_ids = {
+            w.id for w in db.session.query(Wholesaler.id)
+            .filter(Wholesaler.id.in_(requested_ids))
+        }
+    unknown = ~clean['wholesaler_id'].isin(known_ids)
+    errors.extend(_frame_errors(clean[unknown], 'Wholesaler not found'))
+    clean = clean[~unknown]
+
+    # The same product_id twice in one upsert statement is rejected by
+    # Postgres, so the last valid occurrence wins
+    duplicated = clean['product_id'].duplicated(keep='last')
+    errors.extend(_frame_errors(clean[duplicated], 'Duplicate product_id in file (a later row was used)'))
+    clean = clean[~duplicated]
+
+    records = clean[REQUIRED_COLUMNS].to_dict('records')
+    errors.sort(key=lambda e: (e.get('sheet') or '', e['row']))
+    return records, errors
+
+def validate_product_frame(df, first_row=2):
+    """
+    Validate a product sheet with vectorized checks.
+    Returns (records, errors) where records are ready for upsert_products()
+    and errors is a list of {'row', 'product_id', 'error'} dicts.
+    """
+    clean, errors = check_product_frame(df, first_row)
+    return resolve_product_frame(clean, errors)
+
+def upsert_products(records, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Write products with INSERT ... ON CONFLICT (product_id) DO UPDATE.
+    Does not commit; the caller owns the transaction.
+    """
+    table = Product.__table__
+    for start in range(0, len(records), batch_size):
+        batch = [dict(record, available_in_store=True) for record in records[start:start + batch_size]]
+        stmt = pg_insert(table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id],
+            set_={col: stmt.excluded[col] for col in UPDATABLE_COLUMNS}
+        )
+        db.session.execute(stmt)
+    return len(records)
+
+def import_products_from_excel(file_path):
+    """Validate an Excel catalog and upsert every valid row"""
+    df = pd.read_excel(file_path)
+    records, errors = validate_product_frame(df)
+    imported = upsert_products(records)
+    return {
+        'processed': imported + len(errors),
+        'imported': imported,
+        'errors': errors,
+        'error_count': len(errors)
+    }
+
+def iter_excel_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield (first_row, DataFrame) chunks from the first sheet.
+    The workbook is opened read-only so rows are streamed from the file
+    and never held in memory all at once.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col).strip() if col is not None else '' for col in header]
+        width = len(columns)
+
+        buffer = []
+        first_row = 2
+        for values in rows:
+            values = tuple(values[:width])
+            buffer.append(values + (None,) * (width - len(values)))
+            if len(buffer) == chunk_size:
+                yield first_row, pd.DataFrame.from_records(buffer, columns=columns)
+                first_row += len(buffer)
+                buffer = []
+        if buffer:
+            yield first_row, pd.DataFrame.from_records(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+def _file_digest(file_path):
+    """SHA-256 of the uploaded file, used to recognise a re-uploaded import"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _checkpoint_path(digest):
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'import_checkpoints')
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f'{digest}.json')
+
+def load_checkpoint(digest):
+    """Return the saved progress for a file, or None if it was never interrupted"""
+    try:
+        with open(_checkpoint_path(digest)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(digest, state):
+    """Atomically record the last committed row for a file"""
+    path = _checkpoint_path(digest)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def clear_checkpoint(digest):
+    try:
+        os.remove(_checkpoint_path(digest))
+    except OSError:
+        pass
+
+def stream_import_products(file_path, chunk_size=STREAM_CHUNK_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """
+    Import a large catalog chunk by chunk, committing after each chunk.
+    Progress is checkpointed by file hash, so uploading the same file again
+    after a failure continues from the last committed row.
+    """
+    digest = _file_digest(file_path)
+    checkpoint = load_checkpoint(digest)
+    resumed_from = checkpoint['last_row'] + 1 if checkpoint else None
+    state = checkpoint or {'last_row': 1, 'processed': 0, 'imported': 0, 'error_count': 0}
+
+    errors = []
+    for first_row, chunk in iter_excel_chunks(file_path, chunk_size):
+        last_row = first_row + len(chunk) - 1
+        if last_row <= state['last_row']:
+            continue
+        if first_row <= state['last_row']:
+            chunk = chunk.iloc[state['last_row'] - first_row + 1:]
+            first_row = state['last_row'] + 1
+
+        records, chunk_errors = validate_product_frame(chunk, first_row=first_row)
+        upsert_products(records)
+        db.session.commit()
+
+        state = {
+            'last_row': last_row,
+            'processed': state['processed'] + len(records) + len(chunk_errors),
+            'imported': state['imported'] + len(records),
+            'error_count': state['error_count'] + len(chunk_errors)
+        }
+        save_checkpoint(digest, state)
+        # Only the first few errors are kept so memory stays bounded
+        errors.extend(chunk_errors[:max(0, max_errors - len(errors))])
+
+    clear_checkpoint(digest)
+    return {
+        'processed': state['processed'],
+        'imported': state['imported'],
+        'errors': errors,
+        'error_count': state['error_count'],
+        'resumed_from_row': resumed_from
+    }
+
+def _read_sheet(file_path, sheet_name):
+    """Load one worksheet into a DataFrame with a read-only workbook"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame(columns=REQUIRED_COLUMNS)
+        columns = [str(col).strip() if col is not None else '' for col in header]
+        width = len(columns)
+        data = [tuple(values[:width]) + (None,) * (width - len(values)) for values in rows]
+        return pd.DataFrame.from_records(data, columns=columns)
+    finally:
+        workbook.close()
+
+def _parse_sheet(file_path, sheet_name, label):
+    """
+    Worker task: parse and check one sheet.
+    Runs in a separate process, so it must not touch the app or database.
+    """
+    df = _read_sheet(file_path, sheet_name)
+    empty = pd.DataFrame(columns=['row'] + REQUIRED_COLUMNS)
+    if df.dropna(how='all').empty:
+        return label, empty, []
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        # One bad sheet should not abort the rest of the upload
+        return label, empty, [{
+            'row': 1,
+            'product_id': None,
+            'error': 'Sheet is missing columns: ' + ', '.join(missing),
+            'sheet': label
+        }]
+    clean, errors = check_product_frame(df)
+    clean['sheet'] = label
+    for error in errors:
+        error['sheet'] = label
+    return label, clean, errors
+
+def _is_workbook(file_path):
+    """An .xlsx file is itself a ZIP archive; tell the two apart by its manifest"""
+    with zipfile.ZipFile(file_path) as archive:
+        return '[Content_Types].xml' in archive.namelist()
+
+def _extract_workbooks(file_path, target_dir, max_size=MAX_ARCHIVE_SIZE):
+    """Extract the .xlsx members of an uploaded ZIP and return their paths"""
+    paths = []
+    with zipfile.ZipFile(file_path) as archive:
+        members = [m for m in archive.infolist()
+                   if not m.is_dir() and m.filename.lower().endswith('.xlsx')
+                   and not os.path.basename(m.filename).startswith(('.', '~$'))]
+        if sum(m.file_size for m in members) > max_size:
+            raise ValueError('ZIP archive is too large to import')
+        for index, member in enumerate(members):
+            # Flatten names so archive paths can never escape target_dir
+            name = f'{index:03d}_{os.path.basename(member.filename)}'
+            path = os.path.join(target_dir, name)
+            with archive.open(member) as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            paths.append((os.path.basename(member.filename), path))
+    if not paths:
+        raise ValueError('ZIP archive does not contain any .xlsx files')
+    return paths
+
+def parallel_import_products(file_path, max_workers=None):
+    """
+    Import a multi-sheet workbook or a ZIP of workbooks.
+    Sheets are parsed and checked in a process pool, then every valid row is
+    written in a single upsert transaction. Does not commit.
+    """
+    max_workers = max_workers or current_app.config.get('IMPORT_WORKERS') or os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if _is_workbook(file_path):
+            workbooks = [('', file_path)]
+        else:
+            workbooks = _extract_workbooks(file_path, work_dir)
+
+        tasks = []
+        for workbook_name, path in workbooks:
+            workbook = load_workbook(path, read_only=True)
+            try:
+                sheet_names = workbook.sheetnames
+            finally:
+                workbook.close()
+            for sheet_name in sheet_names:
+                label = f'{workbook_name} / {sheet_name}' if workbook_name else sheet_name
+                tasks.append((path, sheet_name, label))
+
+        results = {}
+        workers = max(1, min(max_workers, len(tasks)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_parse_sheet, *task) for task in tasks]
+            for future in as_completed(futures):
+                label, clean, errors = future.result()
+                results[label] = (clean, errors)
+
+    # Merge in upload order so a later sheet wins on repeated product_ids
+    ordered = [results[label] for _, _, label in tasks]
+    frames = [clean for clean, _ in ordered if not clean.empty]
+    clean = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['row', 'sheet'] + REQUIRED_COLUMNS)
+    errors = [error for _, sheet_errors in ordered for error in sheet_errors]
+
+    records, errors = resolve_product_frame(clean, errors)
+    imported = upsert_products(records)
+    return {
+        'processed': imported + len(errors),
+        'imported': imported,
+        'errors': errors,
+        'error_count': len(errors),
+        'sheets': len(tasks)
+    }
+
+def _fetch_catalog(wholesaler_ids, product_ids):
+    """Load the comparable columns of every product the sheet could touch in one query"""
+    columns = ['id', 'product_id', 'name', 'size', 'price', 'wholesaler_id', 'available_in_store']
+    if not wholesaler_ids and not product_ids:
+        return pd.DataFrame(columns=columns)
+    rows = db.session.execute(
+        select(Product.id, Product.product_id, Product.name, Product.size, Product.price,
+               Product.wholesaler_id, Product.available_in_store)
+        .where(or_(Product.wholesaler_id.in_(wholesaler_ids),
+                   Product.product_id.in_(product_ids)))
+    ).all()
+    return pd.DataFrame(rows, columns=columns)
+
+def diff_import_products(file_path):
+    """
+    Apply a wholesaler price sheet as a diff against the current catalog.
+    Products new to the catalog are inserted, changed ones updated, and
+    products of the sheet's wholesalers that are no longer listed are
+    marked unavailable. Price changes are written to product_price_history.
+    Does not commit.
+    """
+    df = pd.read_excel(file_path)
+    records, errors = validate_product_frame(df)
+    sheet = pd.DataFrame(records, columns=REQUIRED_COLUMNS)
+
+    wholesaler_ids = {int(w) for w in sheet['wholesaler_id'].unique()}
+    existing = _fetch_catalog(wholesaler_ids, sheet['product_id'].tolist())
+
+    merged = sheet.merge(existing, on='product_id', how='outer',
+                         suffixes=('', '_old'), indicator=True)
+    new_rows = merged[merged['_merge'] == 'left_only']
+    matched = merged[merged['_merge'] == 'both']
+
+    # Vectorized comparison of every matched row
+    price_changed = ~np.isclose(matched['price'].astype(float), matched['price_old'].astype(float))
+    changed = (
+        price_changed
+        | (matched['name'] != matched['name_old'])
+        | (matched['size'].fillna('') != matched['size_old'].fillna(''))
+        | (matched['wholesaler_id'].astype(int) != matched['wholesaler_id_old'].astype(int))
+        | ~matched['available_in_store'].fillna(True).astype(bool)
+    )
+    updated = matched[changed]
+    repriced = matched[price_changed]
+
+    # Rows that failed validation are not treated as removed
+    failed_ids = {e['product_id'] for e in errors if e['product_id']}
+    removed = merged[
+        (merged['_merge'] == 'right_only')
+        & merged['wholesaler_id_old'].isin(wholesaler_ids)
+        & merged['available_in_store'].fillna(True).astype(bool)
+        & ~merged['product_id'].isin(failed_ids)
+    ]
+
+    inserts = new_rows[REQUIRED_COLUMNS].astype({'wholesaler_id': int, 'size': object})
+    inserts['size'] = inserts['size'].where(inserts['size'].notna(), None)
+    upsert_products(inserts.to_dict('records'))
+
+    if not updated.empty:
+        update_rows = updated[['id'] + UPDATABLE_COLUMNS].astype({'id': int, 'wholesaler_id': int, 'size': object})
+        update_rows['size'] = update_rows['size'].where(update_rows['size'].notna(), None)
+        db.session.execute(
+            update(Product),
+            [dict(row, available_in_store=True) for row in update_rows.to_dict('records')]
+        )
+
+    if not repriced.empty:
+        changed_at = datetime.utcnow()
+        db.session.execute(insert(ProductPriceHistory), [{
+            'product_id': int(row['id']),
+            'old_price': float(row['price_old']),
+            'new_price': float(row['price']),
+            'changed_at': changed_at,
+            'source': 'import'
+        } for row in repriced[['id', 'price', 'price_old']].to_dict('records')])
+
+    if not removed.empty:
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_([int(i) for i in removed['id']]))
+            .values(available_in_store=False)
+        )
+
+    return {
+        'processed': len(records) + len(errors),
+        'imported': len(new_rows) + len(updated),
+        'inserted': len(new_rows),
+        'updated': len(updated),
+        'repriced': len(repriced),
+        'removed': len(removed),
+        'unchanged': len(matched) - len(updated),
+        'errors': errors,
+        'error_count': len(errors)
+    }
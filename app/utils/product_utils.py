@@ -0,0 +1,42 @@
+# app/utils/product_utils.py
+from sqlalchemy import select, update, delete
+from app import db
+from app.models import Product, Wholesaler, CustomerOrderItem
+
+def delete_products_by_id(product_ids):
+    """
+    Delete products with one set-based DELETE. Order list lines go with them
+    through ON DELETE CASCADE; customer order lines keep their price and
+    get the product name copied in before the link is set to NULL.
+    """
+    if not product_ids:
+        return 0
+    db.session.execute(
+        update(CustomerOrderItem)
+        .where(CustomerOrderItem.product_id.in_(product_ids),
+               CustomerOrderItem.custom_product_name.is_(None))
+        .values(custom_product_name=select(Product.name)
+                .where(Product.id == CustomerOrderItem.product_id)
+                .scalar_subquery()),
+        execution_options={'synchronize_session': False}
+    )
+    result = db.session.execute(
+        delete(Product).where(Product.id.in_(product_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def delete_wholesaler_by_id(wholesaler_id):
+    """
+    Delete a wholesaler and its catalog. The products go through
+    delete_products_by_id first so customer order lines keep their names;
+    order lists are removed by ON DELETE CASCADE. Returns whether the
+    wholesaler existed. Does not commit.
+    """
+    product_ids = list(db.session.scalars(
+        select(Product.id).where(Product.wholesaler_id == wholesaler_id)
+    ))
+    delete_products_by_id(product_ids)
+    result = db.session.execute(delete(Wholesaler).where(Wholesaler.id == wholesaler_id))
+    return bool(result.rowcount)
@@ -0,0 +1,102 @@
+# app/utils/sales_rollup.py
+
+from sqlalchemy import select, update, delete, insert, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import db
+from app.models import DailySales, SalesDailyRollup, DISCREPANCY_THRESHOLD
+
+# DailySales columns summed into the rollup, under the same names
+ROLLUP_SUMS = (
+    'total_expected',
+    'total_actual',
+    'front_register_cash',
+    'back_register_cash',
+    'credit_card_total',
+    'otc1_total',
+    'otc2_total',
+    'front_register_discrepancy',
+    'back_register_discrepancy',
+    'overall_discrepancy',
+)
+
+def _delta(sales, sign):
+    values = {name: sign * (getattr(sales, name) or 0.0) for name in ROLLUP_SUMS}
+    values['report_count'] = sign
+    values['discrepancy_count'] = sign if abs(sales.overall_discrepancy or 0.0) > DISCREPANCY_THRESHOLD else 0
+    return values
+
+def add_sales_to_rollup(sales):
+    """
+    Add one DailySales record to its (date, employee) rollup row, creating
+    the row if needed. Runs in the caller's transaction; does not commit.
+    """
+    delta = _delta(sales, 1)
+    table = SalesDailyRollup.__table__
+    stmt = pg_insert(table).values(date=sales.date, employee_id=sales.employee_id, **delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.date, table.c.employee_id],
+        set_={name: table.c[name] + stmt.excluded[name] for name in delta}
+    )
+    db.session.execute(stmt)
+
+def remove_sales_from_rollup(sales):
+    """
+    Subtract one DailySales record from its rollup row and drop the row once
+    no records are left. Runs in the caller's transaction; does not commit.
+    """
+    delta = _delta(sales, -1)
+    table = SalesDailyRollup.__table__
+    key = (table.c.date == sales.date) & (table.c.employee_id == sales.employee_id)
+    db.session.execute(
+        update(table).where(key).values({name: table.c[name] + value for name, value in delta.items()})
+    )
+    db.session.execute(delete(table).where(key, table.c.report_count <= 0))
+
+def rebuild_sales_rollup():
+    """Recompute every rollup row from daily_sales. Does not commit."""
+    table = SalesDailyRollup.__table__
+    db.session.execute(delete(table))
+    source = select(
+        DailySales.date,
+        DailySales.employee_id,
+        func.count(DailySales.id),
+        func.count(DailySales.id).filter(func.abs(DailySales.overall_discrepancy) > DISCREPANCY_THRESHOLD),
+        *[func.sum(getattr(DailySales, name)) for name in ROLLUP_SUMS]
+    ).group_by(DailySales.date, DailySales.employee_id)
+    columns = ['date', 'employee_id', 'report_count', 'discrepancy_count', *ROLLUP_SUMS]
+    result = db.session.execute(insert(table).from_select(columns, source))
+    return result.rowcount
+
+def _date_filter(query, start_date, end_date):
+    if start_date:
+        query = query.where(SalesDailyRollup.date >= start_date)
+    if end_date:
+        query = query.where(SalesDailyRollup.date <= end_date)
+    return query
+
+def sales_summary(start_date=None, end_date=None):
+    """Sales totals over a date range (either end may be open), read from the rollup"""
+    r = SalesDailyRollup
+    query = select(
+        func.coalesce(func.sum(r.report_count), 0).label('report_count'),
+        func.coalesce(func.sum(r.discrepancy_count), 0).label('discrepancy_count'),
+        func.coalesce(func.sum(r.total_actual), 0.0).label('total_sales'),
+        func.coalesce(func.sum(r.front_register_cash + r.back_register_cash), 0.0).label('total_cash'),
+        func.coalesce(func.sum(r.front_register_cash), 0.0).label('total_front_cash'),
+        func.coalesce(func.sum(r.back_register_cash), 0.0).label('total_back_cash'),
+        func.coalesce(func.sum(r.credit_card_total), 0.0).label('total_card'),
+        func.coalesce(func.sum(r.otc1_total + r.otc2_total), 0.0).label('total_otc'),
+        func.coalesce(func.sum(r.overall_discrepancy), 0.0).label('total_discrepancy')
+    )
+    return db.session.execute(_date_filter(query, start_date, end_date)).one()
+
+def daily_sales_totals(start_date, end_date):
+    """(date, report_count, total_sales) per day with sales in the range, oldest first"""
+    r = SalesDailyRollup
+    query = select(
+        r.date,
+        func.sum(r.report_count).label('report_count'),
+        func.sum(r.total_actual).label('total_sales')
+    ).group_by(r.date).order_by(r.date)
+    return db.session.execute(_date_filter(query, start_date, end_date)).all()
@@ -0,0 +1,228 @@
+# app/utils/scheduler.py
+
+import heapq
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import select, update
+from app.models import OrderSchedule
+from app.utils.order_lists import finalize_pending_lists, resolve_pending_lists
+from app.utils.order_utils import prefill_from_standing_orders
+from app import db
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+MAX_LOOKAHEAD_DAYS = 366 * 8  # long enough for a 29 February rule
+DEFAULT_ANCHOR = date(2024, 1, 1)  # a Monday; week 0 of every_weeks cycles
+
+def _parse_field(field, low, high, names=None):
+    """Expand one cron field (*, lists, a-b ranges, /n steps, names) into a set of ints"""
+    names = names or {}
+
+    def number(token):
+        if token in names:
+            return names[token]
+        if not token.isdigit():
+            raise ValueError(f'Unknown value {token!r} in {field!r}')
+        value = int(token)
+        if not low <= value <= high:
+            raise ValueError(f'{token} is out of range {low}-{high}')
+        return value
+
+    values = set()
+    for part in field.lower().split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f'Invalid step in {field}')
+        if part == '*':
+            start, end = low, high
+        else:
+            first, _, last = part.partition('-')
+            start = number(first)
+            end = number(last) if last else (high if step > 1 else start)
+            if start > end:
+                raise ValueError(f'Reversed range {part!r} in {field!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+class DayRule:
+    """
+    Cron-style day rule "day-of-month month day-of-week". As in cron, when
+    both day fields are restricted a day matching either one matches.
+    Day-of-week takes names (mon-sun) or numbers with 0 and 7 for Sunday.
+    every_weeks > 1 keeps every n-th week counted from anchor.
+    """
+
+    def __init__(self, expr, every_weeks=1, anchor=None):
+        fields = (expr or '').split()
+        if len(fields) != 3:
+            raise ValueError('Schedule days need three fields: day-of-month month day-of-week')
+        dom, month, dow = fields
+        self.days = _parse_field(dom, 1, 31)
+        self.months = _parse_field(month, 1, 12, dict(zip(MONTHS, range(1, 13))))
+        # Ranges are expanded over 0-7 with sun=7, so "5-7" and "mon-sun"
+        # run up to Sunday; only then do 0 and 7 both become Sunday
+        cron_dow = _parse_field(dow, 0, 7, dict(zip(WEEKDAYS, range(1, 8))))
+        self.weekdays = {(d - 1) % 7 for d in cron_dow}  # cron 0/7=Sunday -> Python 6
+        self.any_day = dom == '*'
+        self.any_weekday = dow == '*'
+        self.every_weeks = max(1, every_weeks or 1)
+        anchor = anchor or DEFAULT_ANCHOR
+        self.anchor = anchor - timedelta(days=anchor.weekday())
+
+    def matches(self, day):
+        if day.month not in self.months:
+            return False
+        if self.every_weeks > 1 and ((day - self.anchor).days // 7) % self.every_weeks:
+            return False
+        in_month = day.day in self.days
+        in_week = day.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+def next_due(schedule, after):
+    """First cutoff of schedule strictly after the datetime after, or None"""
+    rule = DayRule(schedule.days, schedule.every_weeks, schedule.anchor_date)
+    day = after.date()
+    for _ in range(MAX_LOOKAHEAD_DAYS):
+        if rule.matches(day):
+            due = datetime.combine(day, schedule.cutoff_time)
+            if due > after:
+                return due
+        day += timedelta(days=1)
+    return None
+
+def store_now():
+    """Current wall-clock time in STORE_TIMEZONE, naive like the stored cutoffs"""
+    zone = ZoneInfo(current_app.config.get('STORE_TIMEZONE', 'UTC'))
+    return datetime.now(zone).replace(tzinfo=None)
+
+class DueListScheduler:
+    """
+    Min-heap of (next_due_at, schedule id). Each run pops only the schedules
+    whose cutoff has passed, finalizes their pending lists, opens the next
+    ones and pushes the following cutoff, so the work per tick depends on
+    the due wholesalers only. next_due_at is stored on the schedule and
+    claimed with a compare-and-set, so a second scheduler process cannot
+    handle the same cutoff twice.
+    """
+
+    def __init__(self):
+        self.heap = []
+
+    def load(self, now):
+        """Rebuild the heap from the schedules; new or edited ones get their first cutoff"""
+        rows = db.session.execute(
+            select(OrderSchedule.id, OrderSchedule.next_due_at).where(OrderSchedule.active.is_(True))
+        ).all()
+        self.heap = [(due, schedule_id) for schedule_id, due in rows if due is not None]
+        heapq.heapify(self.heap)
+
+        unscheduled = [schedule_id for schedule_id, due in rows if due is None]
+        if unscheduled:
+            schedules = OrderSchedule.query.filter(OrderSchedule.id.in_(unscheduled)).all()
+            self._advance(schedules, now, finalize=False)
+
+    def next_due_at(self):
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self, now):
+        """Handle every cutoff at or before now; returns what was finalized and opened"""
+        popped = {}
+        while self.heap and self.heap[0][0] <= now:
+            due, schedule_id = heapq.heappop(self.heap)
+            popped[schedule_id] = due
+        if not popped:
+            return {'finalized': 0, 'opened': 0}
+
+        schedules = OrderSchedule.query.filter(OrderSchedule.id.in_(popped),
+                                               OrderSchedule.active.is_(True)).all()
+        claimed = []
+        for schedule in schedules:
+            # Skip cutoffs already handled elsewhere or moved by an edit
+            if schedule.next_due_at != popped[schedule.id]:
+                if schedule.next_due_at is not None:
+                    heapq.heappush(self.heap, (schedule.next_due_at, schedule.id))
+                continue
+            claimed.append(schedule)
+        return self._advance(claimed, now, finalize=True)
+
+    def _advance(self, schedules, now, finalize):
+        """Finalize (optionally) and reopen the lists of schedules, then move them to their next cutoff"""
+        result = {'finalized': 0, 'opened': 0}
+        moved = []
+        for schedule in schedules:
+            following = next_due(schedule, now)
+            claim = db.session.execute(
+                update(OrderSchedule)
+                .where(OrderSchedule.id == schedule.id,
+                       OrderSchedule.next_due_at.is_(None) if schedule.next_due_at is None
+                       else OrderSchedule.next_due_at == schedule.next_due_at)
+                .values(next_due_at=following),
+                execution_options={'synchronize_session': False}
+            )
+            if claim.rowcount:
+                moved.append((schedule, following))
+        if not moved:
+            db.session.commit()
+            return result
+
+        if finalize:
+            by_type = defaultdict(set)
+            for schedule, _ in moved:
+                by_type[schedule.list_type].add(schedule.wholesaler_id)
+            for list_type, wholesaler_ids in by_type.items():
+                result['finalized'] += finalize_pending_lists([list_type], wholesaler_ids)['finalized']
+
+        # Open the next list of each schedule, dated today as generate_daily_lists does
+        due_schedules = [schedule for schedule, following in moved if following is not None]
+        if due_schedules:
+            keys = {(s.wholesaler_id, s.list_type) for s in due_schedules}
+            list_ids = resolve_pending_lists(keys, use_cache=False, day=now.date())
+            result['opened'] += len(list_ids)
+            if finalize:
+                prefill_from_standing_orders(
+                    [list_ids[(s.wholesaler_id, s.list_type)] for s in due_schedules if s.prefill])
+        db.session.commit()
+
+        for schedule, following in moved:
+            if following is not None:
+                heapq.heappush(self.heap, (following, schedule.id))
+        return result
+
+def run_scheduler(once=False):
+    """Scheduler loop: sleep until the earliest cutoff, handle due schedules, repeat"""
+    resync_interval = current_app.config.get('SCHEDULER_RESYNC_INTERVAL', 300)
+    scheduler = DueListScheduler()
+    scheduler.load(store_now())
+    loaded_at = time.monotonic()
+
+    while True:
+        try:
+            result = scheduler.run_due(store_now())
+            if result['finalized'] or result['opened']:
+                current_app.logger.info(f"Order schedules: finalized {result['finalized']} "
+                                        f"and opened {result['opened']} lists")
+            if once:
+                return result
+            # Pick up schedules added or edited since the last load
+            if time.monotonic() - loaded_at >= resync_interval:
+                scheduler.load(store_now())
+                loaded_at = time.monotonic()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error in order scheduler: {str(e)}")
+            if once:
+                raise
+
+        next_due_at = scheduler.next_due_at()
+        wait = resync_interval
+        if next_due_at is not None:
+            wait = min(wait, max((next_due_at - store_now()).total_seconds(), 0))
+        db.session.remove()
+        time.sleep(max(wait, 1))
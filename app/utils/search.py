@@ -0,0 +1,101 @@
+# app/utils/search.py
+
+from sqlalchemy import select, func, or_, case, literal
+from app.models import Product
+from app import db
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Least similarity at which best_product_match() takes a near-miss (a typo)
+# for the product; below it the name is treated as an unknown product
+BEST_MATCH_SIMILARITY = 0.8
+
+def _escape_like(term):
+    """Escape LIKE wildcards so user input is matched literally"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_catalog(term, limit=DEFAULT_LIMIT, wholesaler_id=None, available_only=False):
+    """
+    Ranked product search backed by the pg_trgm GIN indexes.
+    Matches prefixes, substrings and near-misses (typos) on name and
+    product_id. Exact product_id hits rank first, then prefix matches,
+    then by trigram similarity.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    escaped = _escape_like(term)
+    contains = f'%{escaped}%'
+    prefix = f'{escaped}%'
+
+    # word_similarity scores the best matching part of a longer name, so a
+    # typo in one word still ranks the product highly
+    similarity = func.greatest(
+        func.word_similarity(term, Product.name),
+        func.similarity(Product.product_id, term)
+    )
+    score = (
+        similarity
+        + case((Product.product_id == term, 2.0), else_=0.0)
+        + case((or_(Product.name.ilike(prefix, escape='\\'),
+                    Product.product_id.ilike(prefix, escape='\\')), 1.0), else_=0.0)
+    ).label('score')
+
+    query = select(
+        Product.id, Product.product_id, Product.name, Product.size,
+        Product.price, Product.wholesaler_id, Product.available_in_store, score
+    ).where(or_(
+        Product.name.ilike(contains, escape='\\'),
+        Product.product_id.ilike(contains, escape='\\'),
+        Product.name.op('%>')(literal(term)),  # name %> term: word_similarity over threshold
+        Product.product_id.op('%')(literal(term))
+    ))
+
+    if wholesaler_id:
+        query = query.where(Product.wholesaler_id == wholesaler_id)
+    if available_only:
+        # Unknown availability counts as available, as in the products listing
+        query = query.where(Product.available_in_store.isnot(False))
+
+    query = query.order_by(score.desc(), Product.name, Product.id).limit(limit)
+    return [dict(row._mapping) for row in db.session.execute(query)]
+
+def _literal_match(term, wholesaler_id=None, available_only=False):
+    """Best exact, then prefix, then substring match on name or product_id; the shortest name wins a tie"""
+    escaped = _escape_like(term)
+    rank = case(
+        (or_(func.lower(Product.name) == term.lower(), Product.product_id == term), 3),
+        (or_(Product.name.ilike(f'{escaped}%', escape='\\'),
+             Product.product_id.ilike(f'{escaped}%', escape='\\')), 2),
+        else_=1
+    )
+    query = select(Product).where(or_(
+        Product.name.ilike(f'%{escaped}%', escape='\\'),
+        Product.product_id.ilike(f'%{escaped}%', escape='\\')
+    ))
+    if wholesaler_id:
+        query = query.where(Product.wholesaler_id == wholesaler_id)
+    if available_only:
+        query = query.where(Product.available_in_store.isnot(False))
+    query = query.order_by(rank.desc(), func.length(Product.name), Product.name, Product.id).limit(1)
+    return db.session.scalars(query).first()
+
+def best_product_match(term, **filters):
+    """
+    Return the Product a free-text name refers to, or None. Exact, prefix
+    and substring matches are taken as they are; otherwise only a
+    near-miss with similarity of at least BEST_MATCH_SIMILARITY, so an
+    unknown product is reported instead of silently matched to another.
+    """
+    term = (term or '').strip()
+    if not term:
+        return None
+    product = _literal_match(term, **filters)
+    if product is not None or db.session.get_bind().dialect.name != 'postgresql':
+        return product
+    results = search_catalog(term, limit=1, **filters)
+    if not results or results[0]['score'] < BEST_MATCH_SIMILARITY:
+        return None
+    return db.session.get(Product, results[0]['id'])
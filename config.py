@@ -32,6 +32,23 @@ class Config(object):
     # Allowed file extensions
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
+    # Worker processes used to parse multi-sheet and ZIP catalog uploads
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1))
+
+    # In-memory product search index (one per worker)
+    CATALOG_INDEX_ENABLED = os.environ.get('CATALOG_INDEX_ENABLED', 'true').lower() == 'true'
+    CATALOG_VERSION_CHECK_INTERVAL = float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', 2))
+
+    # Memory-mapped copy of closed sales/order history for analytics;
+    # defaults to instance/column_store
+    COLUMN_STORE_ENABLED = os.environ.get('COLUMN_STORE_ENABLED', 'true').lower() == 'true'
+    COLUMN_STORE_PATH = os.environ.get('COLUMN_STORE_PATH')
+
+    # Order schedules: wall-clock zone of cutoff times, and how often the
+    # scheduler re-reads schedules to pick up edits (seconds)
+    STORE_TIMEZONE = os.environ.get('STORE_TIMEZONE', 'UTC')
+    SCHEDULER_RESYNC_INTERVAL = float(os.environ.get('SCHEDULER_RESYNC_INTERVAL', 300))
+
     # Add these to your Config class
     # Allowed file types for sales documents
     ALLOWED_REPORT_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png'}
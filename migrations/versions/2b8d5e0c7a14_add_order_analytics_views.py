@@ -0,0 +1,47 @@
+"""add order analytics materialized views
+
+Revision ID: 2b8d5e0c7a14
+Revises: 4c7e1f9a2b85
+Create Date: 2026-10-18 17:48:30.917263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8d5e0c7a14'
+down_revision = '4c7e1f9a2b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lists and their stored totals per day and wholesaler
+    op.execute("""
+        CREATE MATERIALIZED VIEW order_daily_totals AS
+        SELECT date, wholesaler_id,
+               count(*) AS list_count,
+               sum(item_count) AS line_count,
+               sum(total_value) AS total_value
+        FROM order_list
+        GROUP BY date, wholesaler_id
+    """)
+    # Ordered quantity and value per day, wholesaler and product, at line prices
+    op.execute("""
+        CREATE MATERIALIZED VIEW order_product_daily AS
+        SELECT l.date, l.wholesaler_id, i.product_id,
+               sum(i.quantity) AS quantity,
+               sum(i.quantity * coalesce(i.price, 0)) AS total_value
+        FROM order_list_item AS i
+        JOIN order_list AS l ON l.id = i.order_list_id
+        GROUP BY l.date, l.wholesaler_id, i.product_id
+    """)
+    # REFRESH ... CONCURRENTLY needs a unique index covering every row
+    op.execute('CREATE UNIQUE INDEX ux_order_daily_totals ON order_daily_totals (date, wholesaler_id)')
+    op.execute('CREATE UNIQUE INDEX ux_order_product_daily ON order_product_daily (date, wholesaler_id, product_id)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS order_product_daily')
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS order_daily_totals')
@@ -0,0 +1,43 @@
+"""bump the sales column store version on late sales inserts
+
+Revision ID: 5c7e9b2d4f18
+Revises: 8d2a4f6c1e73
+Create Date: 2026-10-18 23:02:41.318506
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e9b2d4f18'
+down_revision = '8d2a4f6c1e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A report for a past (UTC) day may land after that day was appended to
+    # the store; the stored table no longer holds every row, so rebuild it
+    op.execute("""
+        CREATE OR REPLACE FUNCTION daily_sales_column_store_insert() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM new_sales WHERE date < (now() AT TIME ZONE 'UTC')::date
+            ) THEN
+                UPDATE column_store_version SET version = version + 1 WHERE name = 'sales';
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER daily_sales_column_store_insert
+        AFTER INSERT ON daily_sales REFERENCING NEW TABLE AS new_sales
+        FOR EACH STATEMENT EXECUTE FUNCTION daily_sales_column_store_insert()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS daily_sales_column_store_insert ON daily_sales')
+    op.execute('DROP FUNCTION IF EXISTS daily_sales_column_store_insert()')
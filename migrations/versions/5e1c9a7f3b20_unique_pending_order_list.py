@@ -0,0 +1,46 @@
+"""unique pending order list per wholesaler and type
+
+Revision ID: 5e1c9a7f3b20
+Revises: d2f9f36d9f54
+Create Date: 2026-10-18 14:12:40.318227
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1c9a7f3b20'
+down_revision = 'd2f9f36d9f54'
+branch_labels = None
+depends_on = None
+
+# Pending lists to fold into the oldest pending list of the same wholesaler and type
+DUPLICATES = """
+    SELECT id, min(id) OVER (PARTITION BY wholesaler_id, type) AS keep_id
+    FROM order_list
+    WHERE status = 'pending'
+"""
+
+
+def upgrade():
+    # Merge duplicates created by the old select-then-insert race before the
+    # unique index can be built
+    op.execute(f"""
+        UPDATE order_list_item AS i SET order_list_id = d.keep_id
+        FROM ({DUPLICATES}) AS d
+        WHERE i.order_list_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute(f"""
+        DELETE FROM order_list AS o
+        USING ({DUPLICATES}) AS d
+        WHERE o.id = d.id AND d.id <> d.keep_id
+    """)
+    with op.batch_alter_table('order_list', schema=None) as batch_op:
+        batch_op.create_index('uq_order_list_pending', ['wholesaler_id', 'type'], unique=True,
+                              postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    with op.batch_alter_table('order_list', schema=None) as batch_op:
+        batch_op.drop_index('uq_order_list_pending')
@@ -0,0 +1,32 @@
+"""add product trigram indexes
+
+Revision ID: 6883500ea802
+Revises: b15a8ad7b365
+Create Date: 2026-10-18 10:03:17.554902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6883500ea802'
+down_revision = 'b15a8ad7b365'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_name_trgm', ['name'], unique=False,
+                              postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        batch_op.create_index('ix_product_product_id_trgm', ['product_id'], unique=False,
+                              postgresql_using='gin', postgresql_ops={'product_id': 'gin_trgm_ops'})
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_product_id_trgm')
+        batch_op.drop_index('ix_product_name_trgm')
+    # pg_trgm is left installed; other objects may depend on it
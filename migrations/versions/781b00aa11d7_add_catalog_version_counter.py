@@ -0,0 +1,47 @@
+"""add catalog version counter
+
+Revision ID: 781b00aa11d7
+Revises: 6883500ea802
+Create Date: 2026-10-18 11:26:50.902341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '781b00aa11d7'
+down_revision = '6883500ea802'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO catalog_version (id, version) VALUES (1, 0)')
+
+    # Statement-level trigger so single edits, bulk upserts and set-based
+    # deletes all bump the version exactly once per statement
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER product_catalog_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON product
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS product_catalog_version ON product')
+    op.execute('DROP FUNCTION IF EXISTS bump_catalog_version()')
+    op.drop_table('catalog_version')
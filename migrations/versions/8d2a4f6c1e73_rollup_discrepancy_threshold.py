@@ -0,0 +1,41 @@
+"""count only significant discrepancies in the sales rollup
+
+Revision ID: 8d2a4f6c1e73
+Revises: f1c6d8a3b597
+Create Date: 2026-10-18 22:18:05.117462
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2a4f6c1e73'
+down_revision = 'f1c6d8a3b597'
+branch_labels = None
+depends_on = None
+
+# models.DISCREPANCY_THRESHOLD when this migration was written
+THRESHOLD = 10
+
+
+def upgrade():
+    # The backfill counted every non-zero discrepancy; the app flags only
+    # those beyond the threshold
+    op.execute(f"""
+        UPDATE sales_daily_rollup AS r SET discrepancy_count = (
+            SELECT count(*) FROM daily_sales AS d
+            WHERE d.date = r.date AND d.employee_id = r.employee_id
+              AND abs(d.overall_discrepancy) > {THRESHOLD}
+        )
+    """)
+
+
+def downgrade():
+    op.execute("""
+        UPDATE sales_daily_rollup AS r SET discrepancy_count = (
+            SELECT count(*) FROM daily_sales AS d
+            WHERE d.date = r.date AND d.employee_id = r.employee_id
+              AND d.overall_discrepancy <> 0
+        )
+    """)
@@ -0,0 +1,144 @@
+"""maintained order list totals and line price snapshot
+
+Revision ID: 9a4d61c2e8f7
+Revises: 5e1c9a7f3b20
+Create Date: 2026-10-18 15:02:11.874415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4d61c2e8f7'
+down_revision = '5e1c9a7f3b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_list', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('total_value', sa.Float(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('order_list_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+
+    # Backfill from current prices before the triggers take over
+    op.execute("""
+        UPDATE order_list_item AS i SET price = p.price
+        FROM product AS p WHERE p.id = i.product_id
+    """)
+    op.execute("""
+        UPDATE order_list AS o SET item_count = t.item_count, total_value = t.total_value
+        FROM (
+            SELECT order_list_id, count(*) AS item_count,
+                   coalesce(sum(quantity * price), 0) AS total_value
+            FROM order_list_item GROUP BY order_list_id
+        ) AS t
+        WHERE t.order_list_id = o.id
+    """)
+
+    # New lines take the product's current price unless one is given
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_list_item_snapshot_price() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.price IS NULL THEN
+                SELECT price INTO NEW.price FROM product WHERE id = NEW.product_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_snapshot_price
+        BEFORE INSERT ON order_list_item
+        FOR EACH ROW EXECUTE FUNCTION order_list_item_snapshot_price()
+    """)
+
+    # Statement-level triggers with transition tables apply one aggregated
+    # delta per list, so bulk inserts, set-based deletes and cascades from
+    # order_list/product deletes cost one UPDATE per statement, not per row
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_list_item_totals() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE order_list AS o
+                SET item_count = o.item_count - d.item_count,
+                    total_value = o.total_value - d.total_value
+                FROM (
+                    SELECT order_list_id, count(*) AS item_count,
+                           coalesce(sum(quantity * price), 0) AS total_value
+                    FROM old_items GROUP BY order_list_id
+                ) AS d
+                WHERE o.id = d.order_list_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE order_list AS o
+                SET item_count = o.item_count + d.item_count,
+                    total_value = o.total_value + d.total_value
+                FROM (
+                    SELECT order_list_id, count(*) AS item_count,
+                           coalesce(sum(quantity * price), 0) AS total_value
+                    FROM new_items GROUP BY order_list_id
+                ) AS d
+                WHERE o.id = d.order_list_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_totals_insert
+        AFTER INSERT ON order_list_item REFERENCING NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_totals()
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_totals_update
+        AFTER UPDATE ON order_list_item REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_totals()
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_totals_delete
+        AFTER DELETE ON order_list_item REFERENCING OLD TABLE AS old_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_totals()
+    """)
+
+    # A price change reprices lines of pending lists only; finalized lists
+    # keep the price they were ordered at
+    op.execute("""
+        CREATE OR REPLACE FUNCTION product_reprice_pending_lines() RETURNS trigger AS $$
+        BEGIN
+            UPDATE order_list_item AS i SET price = n.price
+            FROM new_products AS n
+            JOIN old_products AS o ON o.id = n.id, order_list AS l
+            WHERE i.product_id = n.id
+              AND l.id = i.order_list_id
+              AND l.status = 'pending'
+              AND n.price IS DISTINCT FROM o.price;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER product_reprice_pending_lines
+        AFTER UPDATE ON product REFERENCING OLD TABLE AS old_products NEW TABLE AS new_products
+        FOR EACH STATEMENT EXECUTE FUNCTION product_reprice_pending_lines()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS product_reprice_pending_lines ON product')
+    op.execute('DROP FUNCTION IF EXISTS product_reprice_pending_lines()')
+    for event in ('insert', 'update', 'delete'):
+        op.execute(f'DROP TRIGGER IF EXISTS order_list_item_totals_{event} ON order_list_item')
+    op.execute('DROP FUNCTION IF EXISTS order_list_item_totals()')
+    op.execute('DROP TRIGGER IF EXISTS order_list_item_snapshot_price ON order_list_item')
+    op.execute('DROP FUNCTION IF EXISTS order_list_item_snapshot_price()')
+
+    with op.batch_alter_table('order_list_item', schema=None) as batch_op:
+        batch_op.drop_column('price')
+
+    with op.batch_alter_table('order_list', schema=None) as batch_op:
+        batch_op.drop_column('total_value')
+        batch_op.drop_column('item_count')
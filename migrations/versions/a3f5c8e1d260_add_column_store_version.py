@@ -0,0 +1,138 @@
+"""add column store version counters
+
+Revision ID: a3f5c8e1d260
+Revises: 2b8d5e0c7a14
+Create Date: 2026-10-18 18:31:07.455120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f5c8e1d260'
+down_revision = '2b8d5e0c7a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('column_store_version',
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO column_store_version (name, version) VALUES ('sales', 0), ('orders', 0)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_column_store_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE column_store_version SET version = version + 1 WHERE name = TG_ARGV[0];
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Sales are inserted for the current day, which the store never holds;
+    # any edit or delete may touch a stored day
+    op.execute("""
+        CREATE TRIGGER daily_sales_column_store
+        AFTER UPDATE OR DELETE OR TRUNCATE ON daily_sales
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_column_store_version('sales')
+    """)
+
+    # Order lists: changes to finalized lists, and lists finalized with a
+    # closing day already in the past (e.g. no finalized_date recorded)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_list_column_store() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM old_lists WHERE status = 'finalized') THEN
+                UPDATE column_store_version SET version = version + 1 WHERE name = 'orders';
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE' THEN
+                IF EXISTS (
+                    SELECT 1 FROM new_lists
+                    WHERE status = 'finalized'
+                      AND coalesce(finalized_date::date, date) < current_date
+                ) THEN
+                    UPDATE column_store_version SET version = version + 1 WHERE name = 'orders';
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_column_store_update
+        AFTER UPDATE ON order_list REFERENCING OLD TABLE AS old_lists NEW TABLE AS new_lists
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_column_store()
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_column_store_delete
+        AFTER DELETE ON order_list REFERENCING OLD TABLE AS old_lists
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_column_store()
+    """)
+
+    # Lines added to, edited on or removed from finalized lists, including
+    # deletes cascaded from products
+    op.execute("""
+        CREATE OR REPLACE FUNCTION order_list_item_column_store() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF EXISTS (
+                    SELECT 1 FROM old_items AS i JOIN order_list AS l ON l.id = i.order_list_id
+                    WHERE l.status = 'finalized'
+                ) THEN
+                    UPDATE column_store_version SET version = version + 1 WHERE name = 'orders';
+                    RETURN NULL;
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                IF EXISTS (
+                    SELECT 1 FROM new_items AS i JOIN order_list AS l ON l.id = i.order_list_id
+                    WHERE l.status = 'finalized'
+                ) THEN
+                    UPDATE column_store_version SET version = version + 1 WHERE name = 'orders';
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_column_store_insert
+        AFTER INSERT ON order_list_item REFERENCING NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_column_store()
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_column_store_update
+        AFTER UPDATE ON order_list_item REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_column_store()
+    """)
+    op.execute("""
+        CREATE TRIGGER order_list_item_column_store_delete
+        AFTER DELETE ON order_list_item REFERENCING OLD TABLE AS old_items
+        FOR EACH STATEMENT EXECUTE FUNCTION order_list_item_column_store()
+    """)
+
+    for table in ('order_list', 'order_list_item'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_column_store_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_column_store_version('orders')
+        """)
+
+
+def downgrade():
+    for table in ('order_list', 'order_list_item'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_column_store_truncate ON {table}')
+    for event in ('insert', 'update', 'delete'):
+        op.execute(f'DROP TRIGGER IF EXISTS order_list_item_column_store_{event} ON order_list_item')
+    op.execute('DROP FUNCTION IF EXISTS order_list_item_column_store()')
+    for event in ('update', 'delete'):
+        op.execute(f'DROP TRIGGER IF EXISTS order_list_column_store_{event} ON order_list')
+    op.execute('DROP FUNCTION IF EXISTS order_list_column_store()')
+    op.execute('DROP TRIGGER IF EXISTS daily_sales_column_store ON daily_sales')
+    op.execute('DROP FUNCTION IF EXISTS bump_column_store_version()')
+    op.drop_table('column_store_version')
@@ -0,0 +1,61 @@
+"""cascade foreign keys
+
+Revision ID: d2f9f36d9f54
+Revises: b04ff4d1a923
+Create Date: 2026-10-18 13:31:52.640018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f9f36d9f54'
+down_revision = 'b04ff4d1a923'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table, ON DELETE action)
+FOREIGN_KEYS = [
+    ('order_list_item', 'order_list_id', 'order_list', 'CASCADE'),
+    ('order_list_item', 'product_id', 'product', 'CASCADE'),
+    ('customer_order_item', 'customer_order_id', 'customer_order', 'CASCADE'),
+    ('customer_order_item', 'product_id', 'product', 'SET NULL'),
+    ('product', 'wholesaler_id', 'wholesaler', 'CASCADE'),
+    ('order_list', 'wholesaler_id', 'wholesaler', 'CASCADE'),
+    ('sales_documents', 'sales_id', 'daily_sales', 'CASCADE'),
+]
+
+# Referencing columns need an index or every cascaded delete scans the child table
+INDEXES = [
+    ('order_list_item', 'order_list_id'),
+    ('order_list_item', 'product_id'),
+    ('customer_order_item', 'customer_order_id'),
+    ('customer_order_item', 'product_id'),
+    ('order_list', 'wholesaler_id'),
+    ('sales_documents', 'sales_id'),
+]
+
+
+def upgrade():
+    for table, column, referred, action in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=action)
+
+    for table, column in INDEXES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{table}_{column}'), [column], unique=False)
+
+
+def downgrade():
+    for table, column in reversed(INDEXES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_{column}'))
+
+    for table, column, referred, _ in reversed(FOREIGN_KEYS):
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'])
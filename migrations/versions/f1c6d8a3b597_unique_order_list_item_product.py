@@ -0,0 +1,45 @@
+"""unique order list line per product
+
+Revision ID: f1c6d8a3b597
+Revises: a3f5c8e1d260
+Create Date: 2026-10-18 21:40:12.604381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d8a3b597'
+down_revision = 'a3f5c8e1d260'
+branch_labels = None
+depends_on = None
+
+# Lines to fold into the oldest line of the same list and product
+DUPLICATES = """
+    SELECT id, min(id) OVER (PARTITION BY order_list_id, product_id) AS keep_id,
+           sum(quantity) OVER (PARTITION BY order_list_id, product_id) AS quantity
+    FROM order_list_item
+"""
+
+
+def upgrade():
+    # Merge duplicates left by concurrent first adds of a product before the
+    # unique index can be built
+    op.execute(f"""
+        UPDATE order_list_item AS i SET quantity = d.quantity
+        FROM ({DUPLICATES}) AS d
+        WHERE i.id = d.id AND d.id = d.keep_id AND i.quantity <> d.quantity
+    """)
+    op.execute(f"""
+        DELETE FROM order_list_item AS i
+        USING ({DUPLICATES}) AS d
+        WHERE i.id = d.id AND d.id <> d.keep_id
+    """)
+    with op.batch_alter_table('order_list_item', schema=None) as batch_op:
+        batch_op.create_index('uq_order_list_item_product', ['order_list_id', 'product_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('order_list_item', schema=None) as batch_op:
+        batch_op.drop_index('uq_order_list_item_product')
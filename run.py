@@ -1,5 +1,5 @@
 from app import create_app, db
-from app.models import User, Product, Wholesaler, OrderList, OrderListItem, CustomerOrder, CustomerOrderItem, DailySales, SalesDocument
+from app.models import User, Product, Wholesaler, OrderList, OrderListItem, CustomerOrder, CustomerOrderItem, DailySales, SalesDocument, ProductPriceHistory
 
 app = create_app()
 
@@ -15,7 +15,8 @@ def make_shell_context():
         'CustomerOrder': CustomerOrder,
         'CustomerOrderItem': CustomerOrderItem,
         'DailySales': DailySales,
-        'SalesDocument': SalesDocument
+        'SalesDocument': SalesDocument,
+        'ProductPriceHistory': ProductPriceHistory
     }
 
 if __name__ == '__main__':
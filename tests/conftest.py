@@ -0,0 +1,25 @@
+# tests/conftest.py
+
+import pytest
+from flask import Flask
+
+from app import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Bare app over an in-memory SQLite database. The blueprints are not
+    registered, so the utilities are tested without the web stack.
+    """
+    app = Flask('app')
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        COLUMN_STORE_PATH=str(tmp_path / 'column_store'),
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,112 @@
+# tests/test_column_store.py
+
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import db
+from app.models import User, DailySales, ColumnStoreVersion
+from app.utils import column_store
+from app.utils.column_store import SALES, update_table, read_columns
+
+DAY = date(2026, 3, 2)
+
+
+def add_sales(employee, day, amount):
+    fields = ('front_register_amount', 'back_register_amount', 'credit_card_amount',
+              'otc1_amount', 'otc2_amount', 'front_register_cash', 'back_register_cash',
+              'credit_card_total', 'otc1_total', 'otc2_total', 'total_expected',
+              'front_register_discrepancy', 'back_register_discrepancy', 'overall_discrepancy')
+    db.session.add(DailySales(date=day, report_time=datetime.combine(day, datetime.min.time()),
+                              employee_id=employee.id, total_actual=amount, **dict.fromkeys(fields, 0.0)))
+    db.session.commit()
+
+
+def column_sizes(manifest):
+    directory = os.path.join(column_store._table_dir(SALES), manifest['generation'])
+    return {name: os.path.getsize(os.path.join(directory, f'{name}.bin')) // np.dtype(dtype).itemsize
+            for name, dtype in SALES.columns}
+
+
+@pytest.fixture
+def employee(app):
+    user = User(username='clerk', email='clerk@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def watermark(monkeypatch):
+    """Control the closed watermark: set ['day'] to move it"""
+    state = {'day': DAY}
+    monkeypatch.setattr(column_store, 'closed_watermark', lambda: state['day'])
+    return state
+
+
+def test_append_after_failed_manifest_write_stays_aligned(app, employee, watermark, monkeypatch):
+    add_sales(employee, DAY, 10.0)
+    add_sales(employee, DAY, 20.0)
+    manifest = update_table(SALES, blocking=True)
+    assert manifest['rows'] == 2
+
+    add_sales(employee, DAY + timedelta(days=1), 30.0)
+    watermark['day'] = DAY + timedelta(days=1)
+
+    # Crash after the columns were appended but before the manifest was replaced
+    def crash(table, manifest):
+        raise OSError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setattr(column_store, '_write_manifest', crash)
+        with pytest.raises(OSError):
+            update_table(SALES, blocking=True)
+    assert column_store._read_manifest(SALES)['rows'] == 2
+    assert set(column_sizes(manifest).values()) == {3}
+
+    add_sales(employee, DAY + timedelta(days=2), 40.0)
+    watermark['day'] = DAY + timedelta(days=2)
+    manifest = update_table(SALES, blocking=True)
+
+    assert manifest['rows'] == 4
+    assert set(column_sizes(manifest).values()) == {4}
+    column_store._mapped.clear()
+    columns = column_store._map(SALES, manifest)
+    assert columns['total_actual'].tolist() == [10.0, 20.0, 30.0, 40.0]
+    assert columns['date'].tolist() == [DAY, DAY, DAY + timedelta(days=1), DAY + timedelta(days=2)]
+
+
+def test_missing_rows_force_a_rebuild(app, employee, watermark):
+    add_sales(employee, DAY, 10.0)
+    manifest = update_table(SALES, blocking=True)
+    directory = os.path.join(column_store._table_dir(SALES), manifest['generation'])
+    os.truncate(os.path.join(directory, 'total_actual.bin'), 0)
+
+    add_sales(employee, DAY + timedelta(days=1), 20.0)
+    watermark['day'] = DAY + timedelta(days=1)
+    rebuilt = update_table(SALES, blocking=True)
+
+    assert rebuilt['generation'] != manifest['generation']
+    assert rebuilt['rows'] == 2
+    assert column_store._map(SALES, rebuilt)['total_actual'].tolist() == [10.0, 20.0]
+
+
+def test_reads_serve_live_rows_and_never_update_the_store(app, employee, watermark):
+    add_sales(employee, DAY, 10.0)
+    manifest = update_table(SALES, blocking=True)
+
+    # A day closed since the last update is read live
+    add_sales(employee, DAY + timedelta(days=1), 20.0)
+    watermark['day'] = DAY + timedelta(days=1)
+    columns = read_columns(SALES, DAY, DAY + timedelta(days=1))
+    assert columns['total_actual'].tolist() == [10.0, 20.0]
+    assert column_store._read_manifest(SALES) == manifest
+
+    # Stored history was edited: everything is read live until the rebuild
+    db.session.query(DailySales).filter_by(date=DAY).update({'total_actual': 15.0})
+    db.session.add(ColumnStoreVersion(name='sales', version=1))
+    db.session.commit()
+    columns = read_columns(SALES, DAY, DAY + timedelta(days=1))
+    assert sorted(columns['total_actual'].tolist()) == [15.0, 20.0]
+    assert column_store._read_manifest(SALES) == manifest
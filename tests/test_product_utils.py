@@ -0,0 +1,30 @@
+# tests/test_product_utils.py
+
+from app import db
+from app.models import Product, Wholesaler, CustomerOrder, CustomerOrderItem
+from app.utils.product_utils import delete_wholesaler_by_id
+
+
+def test_customer_order_lines_keep_their_name_when_the_wholesaler_is_deleted(app):
+    db.session.execute(db.text('PRAGMA foreign_keys = ON'))
+    wholesaler = Wholesaler(name='Acme')
+    db.session.add(wholesaler)
+    db.session.flush()
+    product = Product(product_id='A-1', name='Aspirin 100ct', price=4.5, wholesaler_id=wholesaler.id)
+    order = CustomerOrder(customer_name='Pat', customer_contact='555-0100')
+    db.session.add_all([product, order])
+    db.session.flush()
+    line = CustomerOrderItem(customer_order_id=order.id, product_id=product.id, quantity=2, price=4.5)
+    db.session.add(line)
+    db.session.commit()
+    wholesaler_id, line_id = wholesaler.id, line.id
+
+    assert delete_wholesaler_by_id(wholesaler_id)
+    db.session.commit()
+    db.session.expire_all()
+
+    line = db.session.get(CustomerOrderItem, line_id)
+    assert line.product_id is None
+    assert line.custom_product_name == 'Aspirin 100ct'
+    assert db.session.get(Wholesaler, wholesaler_id) is None
+    assert not delete_wholesaler_by_id(wholesaler_id)
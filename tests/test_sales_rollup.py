@@ -0,0 +1,36 @@
+# tests/test_sales_rollup.py
+
+from datetime import date, datetime
+
+from app import db
+from app.models import User, DailySales, DISCREPANCY_THRESHOLD
+from app.utils.sales_rollup import rebuild_sales_rollup, sales_summary, _delta
+
+DAY = date(2026, 3, 2)
+
+
+def sales(employee, discrepancy):
+    fields = ('front_register_amount', 'back_register_amount', 'credit_card_amount',
+              'otc1_amount', 'otc2_amount', 'front_register_cash', 'back_register_cash',
+              'credit_card_total', 'otc1_total', 'otc2_total', 'total_expected', 'total_actual',
+              'front_register_discrepancy', 'back_register_discrepancy')
+    return DailySales(date=DAY, report_time=datetime(2026, 3, 2, 18), employee_id=employee.id,
+                      overall_discrepancy=discrepancy, **dict.fromkeys(fields, 0.0))
+
+
+def test_only_discrepancies_beyond_the_threshold_are_counted(app):
+    employee = User(username='clerk', email='clerk@example.com')
+    db.session.add(employee)
+    db.session.flush()
+    reports = [sales(employee, value) for value in
+               (0.0, 4.5, -DISCREPANCY_THRESHOLD, DISCREPANCY_THRESHOLD, DISCREPANCY_THRESHOLD + 0.5, -25.0)]
+    db.session.add_all(reports)
+    db.session.commit()
+
+    assert [_delta(report, 1)['discrepancy_count'] for report in reports] == [0, 0, 0, 0, 1, 1]
+    assert [report.has_significant_discrepancy for report in reports] == [False, False, False, False, True, True]
+
+    rebuild_sales_rollup()
+    summary = sales_summary(DAY, DAY)
+    assert summary.report_count == 6
+    assert summary.discrepancy_count == 2
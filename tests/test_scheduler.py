@@ -0,0 +1,41 @@
+# tests/test_scheduler.py
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.utils.scheduler import DayRule
+
+MONDAY = date(2026, 3, 2)
+
+
+def weekdays(expr):
+    rule = DayRule(f'* * {expr}')
+    return [day.weekday() for day in (MONDAY + timedelta(days=i) for i in range(7)) if rule.matches(day)]
+
+
+@pytest.mark.parametrize('expr, expected', [
+    ('1-7', [0, 1, 2, 3, 4, 5, 6]),
+    ('mon-sun', [0, 1, 2, 3, 4, 5, 6]),
+    ('5-7', [4, 5, 6]),
+    ('fri-sun', [4, 5, 6]),
+    ('0', [6]),
+    ('7', [6]),
+    ('sun', [6]),
+    ('0-2', [0, 1, 6]),
+    ('mon,thu', [0, 3]),
+    ('*', [0, 1, 2, 3, 4, 5, 6]),
+])
+def test_day_of_week_fields(expr, expected):
+    assert weekdays(expr) == expected
+
+
+@pytest.mark.parametrize('expr', ['8', 'funday', '1/0', 'sun-mon', '5-2'])
+def test_invalid_day_of_week_fields(expr):
+    with pytest.raises(ValueError):
+        DayRule(f'* * {expr}')
+
+
+def test_months_by_name():
+    rule = DayRule('1 jan,mar-apr *')
+    assert [month for month in range(1, 13) if rule.matches(date(2026, month, 1))] == [1, 3, 4]
@@ -0,0 +1,47 @@
+# tests/test_search.py
+
+import pytest
+
+from app import db
+from app.models import Wholesaler, Product
+from app.utils.search import best_product_match
+
+
+@pytest.fixture
+def catalog(app):
+    wholesaler = Wholesaler(name='Dairy Co')
+    db.session.add(wholesaler)
+    db.session.flush()
+    products = {
+        name: Product(product_id=code, name=name, price=1.0, wholesaler_id=wholesaler.id, available_in_store=available)
+        for code, name, available in [
+            ('MLK-2', 'Semi Skimmed Milk', True),
+            ('MLK-20', 'Semi Skimmed Milk 2 Pack', True),
+            ('CHO-1', 'Dark Chocolate', False),
+            ('CHE-1', 'Mature Cheddar', None),
+        ]
+    }
+    db.session.add_all(products.values())
+    db.session.commit()
+    return products
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('semi skimmed milk', 'Semi Skimmed Milk'),
+    ('MLK-2', 'Semi Skimmed Milk'),
+    ('Semi', 'Semi Skimmed Milk'),
+    ('cheddar', 'Mature Cheddar'),
+])
+def test_exact_prefix_and_substring_matches(catalog, term, expected):
+    assert best_product_match(term) is catalog[expected]
+
+
+@pytest.mark.parametrize('term', ['Orange Juice', 'Semi Skimed Milk', '', '   '])
+def test_dissimilar_or_misspelled_name_gets_no_match(catalog, term):
+    assert best_product_match(term) is None
+
+
+def test_unknown_availability_counts_as_available(catalog):
+    assert best_product_match('cheddar', available_only=True) is catalog['Mature Cheddar']
+    assert best_product_match('chocolate', available_only=True) is None
+    assert best_product_match('chocolate') is catalog['Dark Chocolate']